@@ -0,0 +1,27 @@
+"""
+Super Realistic ASCII Art Generator Pro 2.0.
+
+The conversion engine is importable without tkinter:
+
+    from ascii_art_generator import ConversionEngine
+    result = ConversionEngine({'width': 100}).convert('photo.jpg')
+    print(result.text)
+
+Heavy modules (numpy, Pillow, tkinter) are only imported when first used.
+"""
+
+__version__ = "2.0"
+
+from .settings import ASCII_SETS, DEFAULT_SETTINGS, SETTING_CHOICES
+
+_ENGINE_EXPORTS = ('CancelToken', 'ConversionCancelled', 'ConversionEngine', 'ConversionResult', 'convert')
+
+__all__ = ['ASCII_SETS', 'DEFAULT_SETTINGS', 'SETTING_CHOICES', *_ENGINE_EXPORTS]
+
+
+def __getattr__(name):
+    # Load the engine lazily so `python -m ascii_art_generator --help` stays fast
+    if name in _ENGINE_EXPORTS:
+        from . import engine
+        return getattr(engine, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,329 @@
+"""
+Command line interface.
+
+    python -m ascii_art_generator                     # launch the GUI
+    python -m ascii_art_generator convert photo.jpg   # print ASCII art
+    python -m ascii_art_generator convert photo.jpg -o art.txt --width 200 --timing
+    python -m ascii_art_generator convert photo.jpg --color-ascii --ansi 256
+    python -m ascii_art_generator convert photo.jpg --color-ascii -o art.png --font-size 12
+    python -m ascii_art_generator convert photo.jpg --color-ascii -o art.aag --color-storage palette
+    python -m ascii_art_generator render art.aag -o art.html --theme terminal
+    python -m ascii_art_generator convert photo.jpg --profile --trace trace.json --profile-log stages.jsonl
+    python -m ascii_art_generator batch photos/ "more/*.png" -o out/ -f html -j 8
+    python -m ascii_art_generator serve --port 8000 --workers 4
+    python -m ascii_art_generator animate cat.gif -o cat.ans && python -m ascii_art_generator play cat.ans
+
+Only argparse is imported up front; numpy and Pillow are loaded when a
+command actually needs them and tkinter is only loaded for the GUI.
+"""
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import sys
+
+from .settings import ANSI_MODES, DEFAULT_SETTINGS, HTML_THEMES, SETTING_CHOICES
+
+
+def add_settings_arguments(parser):
+    """Add one option per conversion setting (e.g. --width, --no-adaptive)."""
+    group = parser.add_argument_group("conversion settings")
+    for key, default in DEFAULT_SETTINGS.items():
+        flag = '--' + key.replace('_', '-')
+        if isinstance(default, bool):
+            group.add_argument(flag, dest=key, action=argparse.BooleanOptionalAction, default=None,
+                               help=f"(default: {default})")
+        else:
+            group.add_argument(flag, dest=key, type=type(default), default=None,
+                               choices=SETTING_CHOICES.get(key), help=f"(default: {default})")
+
+
+def settings_from_args(args):
+    """Collect the settings that were given on the command line."""
+    return {key: getattr(args, key) for key in DEFAULT_SETTINGS if getattr(args, key, None) is not None}
+
+
+def _report(args, label, started):
+    if args.timing:
+        print(f"⏱ {label}: {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+
+
+def cmd_gui(args):
+    from .gui import main as gui_main
+    gui_main()
+    return 0
+
+
+def cmd_convert(args):
+    t0 = time.perf_counter()
+    from .engine import ConversionEngine
+    _report(args, "engine import", t0)
+
+    profiler = None
+    if args.profile or args.trace or args.profile_log:
+        from .profiling import StageProfiler
+        profiler = StageProfiler()
+
+    t0 = time.perf_counter()
+    result = ConversionEngine(settings_from_args(args)).convert(args.image, profiler=profiler)
+    _report(args, "conversion", t0)
+
+    t0 = time.perf_counter()
+    if profiler is None:
+        _write_result(args, result)
+    else:
+        with profiler.stage('write'):
+            _write_result(args, result)
+        profiler.finish()
+    _report(args, "write", t0)
+    _report(args, "total since startup", _START)
+
+    if profiler is not None:
+        if args.profile:
+            print(profiler.format_breakdown(), file=sys.stderr)
+        if args.trace:
+            profiler.write_chrome_trace(args.trace)
+        if args.profile_log:
+            profiler.append_log(args.profile_log, source=args.image, settings=result.settings,
+                                seconds=result.elapsed, cache_hits=result.cache_hits)
+    return 0
+
+
+def _write_result(args, result):
+    if args.output:
+        from .export import save_result
+        save_result(args.output, result, args.theme, args.ansi or 'truecolor', args.font_size,
+                    getattr(args, 'color_storage', 'rgb'))
+    elif args.ansi:
+        from .ansi import write_ansi
+        write_ansi(sys.stdout, result, args.ansi)
+    else:
+        sys.stdout.write(result.text + '\n')
+
+
+def cmd_render(args):
+    from .container import open_result
+    _write_result(args, open_result(args.file))
+    return 0
+
+
+def cmd_animate(args):
+    from .animation import convert_frames, is_animated, save_animation
+
+    if not is_animated(args.image):
+        print(f"❌ {args.image} has a single frame; use 'convert' for still images.", file=sys.stderr)
+        return 1
+
+    converted = []  # conversion times of the frames that were not repeats
+    failed = []     # frames whose worker died
+
+    def frames():
+        for frame in convert_frames(args.image, settings_from_args(args), args.workers, args.max_in_flight):
+            if not frame.ok:
+                failed.append(frame)
+                print(f"❌ frame {frame.index}: {frame.error}", file=sys.stderr)
+            elif frame.repeat_of is None:
+                converted.append(frame.result.elapsed)
+                if args.timing:
+                    print(f"⏱ frame {frame.index}: {frame.result.elapsed * 1000:.1f} ms", file=sys.stderr)
+            elif args.timing:
+                print(f"♻️ frame {frame.index}: same as frame {frame.repeat_of}", file=sys.stderr)
+            yield frame
+
+    t0 = time.perf_counter()
+    count = save_animation(args.output, frames(), args.theme, args.ansi)
+    elapsed = time.perf_counter() - t0
+    print(f"✅ {count} frames ({len(converted)} converted, {count - len(converted)} reused) "
+          f"in {elapsed:.2f} s -> {args.output}")
+    if failed:
+        print(f"❌ {len(failed)} frames failed and were left out", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_play(args):
+    from .animation import play_ansi
+    try:
+        play_ansi(args.file, args.loops)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_serve(args):
+    from .service import serve
+    serve(args.host, args.port, args.workers, args.queue_size, args.verbose)
+    return 0
+
+
+def cmd_benchmark(args):
+    from .benchmark import run_benchmarks, save_report
+
+    def progress(label, results):
+        total = sum(r['seconds'] for r in results)
+        print(f"⏱ {label}: {len(results)} stages, {total * 1000:.0f} ms", file=sys.stderr)
+        if args.verbose:
+            for r in results:
+                print(f"    {r['stage']:<22} {r['seconds'] * 1000:10.2f} ms", file=sys.stderr)
+
+    report = run_benchmarks(args.sizes, args.modes, settings_from_args(args), args.repeat, progress)
+    save_report(report, args.output)
+    print(f"✅ {len(report['results'])} timings written to {args.output}")
+    return 0
+
+
+def cmd_benchmark_compare(args):
+    from .benchmark import compare_reports, load_report
+    rows = compare_reports(load_report(args.base), load_report(args.new), args.threshold, args.min_ms / 1000)
+    regressions = [row for row in rows if row[5]]
+    for image, stage, before, after, change, regressed in rows:
+        if regressed or args.verbose:
+            mark = '❌' if regressed else '  '
+            print(f"{mark} {image:<12} {stage:<22} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms ({change:+.1%})")
+    print(f"{len(rows)} stages compared, {len(regressions)} regressed by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def cmd_compare_order(args):
+    from .engine import compare_pipeline_orders
+    report = compare_pipeline_orders(args.image, settings_from_args(args), args.repeat)
+    print(f"quality order:   {report['quality_seconds'] * 1000:.1f} ms")
+    print(f"fast order:      {report['fast_seconds'] * 1000:.1f} ms")
+    print(f"speedup:         {report['speedup']:.2f}x")
+    print(f"identical chars: {report['identical_chars'] * 100:.1f}%")
+    print(f"mean glyph diff: {report['mean_glyph_diff']:.3f}")
+    print(f"PSNR:            {report['psnr_db']:.1f} dB")
+    return 0
+
+
+def cmd_batch(args):
+    from .batch import run_batch
+
+    def print_item(item):
+        if item.ok:
+            print(f"✅ {item.source} -> {item.output} ({item.elapsed * 1000:.0f} ms)")
+        else:
+            print(f"❌ {item.source}: {item.error}", file=sys.stderr)
+
+    report = run_batch(args.inputs, args.output_dir, args.format, settings_from_args(args),
+                       args.workers, args.max_in_flight, args.theme, print_item)
+    print(f"{len(report.succeeded)} converted, {len(report.failed)} failed in {report.elapsed:.2f} s "
+          f"({report.throughput:.1f} images/s)")
+    return 1 if report.failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ascii_art_generator",
+        description="Super Realistic ASCII Art Generator Pro 2.0. Run without a command to open the GUI.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    gui_parser = subparsers.add_parser('gui', help="Open the desktop application.")
+    gui_parser.set_defaults(func=cmd_gui)
+
+    convert_parser = subparsers.add_parser('convert', help="Convert one image without the GUI.")
+    convert_parser.add_argument('image', help="Path to the input image.")
+    convert_parser.add_argument('-o', '--output', help="Write to this file instead of stdout (.txt, .md, .html, .ans, .png, .webp or .aag).")
+    convert_parser.add_argument('--theme', default='matrix', choices=list(HTML_THEMES),
+                                help="Theme for HTML output.")
+    convert_parser.add_argument('--ansi', choices=ANSI_MODES,
+                                help="Print color ASCII with ANSI escapes in this color mode (also used for .ans files).")
+    convert_parser.add_argument('--font-size', type=int, help="Font size in pixels for .png and .webp output (default: 14).")
+    convert_parser.add_argument('--color-storage', default='rgb', choices=['rgb', 'palette'],
+                                help="How .aag files store color art: exact RGB or one palette byte per cell.")
+    convert_parser.add_argument('--timing', action='store_true', help="Print startup and conversion times to stderr.")
+    convert_parser.add_argument('--profile', action='store_true',
+                                help="Print wall time, CPU time and peak memory of every stage to stderr.")
+    convert_parser.add_argument('--trace', metavar='FILE', help="Write a Chrome trace (chrome://tracing, Perfetto) of the stages.")
+    convert_parser.add_argument('--profile-log', metavar='FILE', help="Append the stage records as one JSON line.")
+    add_settings_arguments(convert_parser)
+    convert_parser.set_defaults(func=cmd_convert)
+
+    render_parser = subparsers.add_parser('render', help="Render a saved .aag result as text, HTML, ANSI or an image.")
+    render_parser.add_argument('file', help="Path to the .aag file.")
+    render_parser.add_argument('-o', '--output', help="Write to this file instead of stdout (.txt, .md, .html, .ans, .png or .webp).")
+    render_parser.add_argument('--theme', default='matrix', choices=list(HTML_THEMES), help="Theme for HTML and image output.")
+    render_parser.add_argument('--ansi', choices=ANSI_MODES,
+                               help="Print color ASCII with ANSI escapes in this color mode (also used for .ans files).")
+    render_parser.add_argument('--font-size', type=int, help="Font size in pixels for .png and .webp output (default: 14).")
+    render_parser.set_defaults(func=cmd_render)
+
+    batch_parser = subparsers.add_parser('batch', help="Convert many images in parallel.")
+    batch_parser.add_argument('inputs', nargs='+', help="Image files, directories or glob patterns (quote them).")
+    batch_parser.add_argument('-o', '--output-dir', required=True, help="Directory for the converted files.")
+    batch_parser.add_argument('-f', '--format', default='txt', choices=['txt', 'html', 'md', 'png', 'webp', 'aag'], help="Output file format.")
+    batch_parser.add_argument('-j', '--workers', type=int, help="Worker processes (default: CPU count).")
+    batch_parser.add_argument('--max-in-flight', type=int, help="Images queued at once (default: twice the workers).")
+    batch_parser.add_argument('--theme', default='matrix', choices=list(HTML_THEMES), help="Theme for HTML output.")
+    add_settings_arguments(batch_parser)
+    batch_parser.set_defaults(func=cmd_batch)
+
+    animate_parser = subparsers.add_parser('animate', help="Convert every frame of an animated GIF, APNG or WebP.")
+    animate_parser.add_argument('image', help="Path to the animated image.")
+    animate_parser.add_argument('-o', '--output', required=True,
+                                help="Animated .html page, or an ANSI playback file (e.g. .ans) for 'play'.")
+    animate_parser.add_argument('-j', '--workers', type=int, help="Worker processes (default: CPU count).")
+    animate_parser.add_argument('--max-in-flight', type=int, help="Frames held in memory at once (default: twice the workers).")
+    animate_parser.add_argument('--theme', default='matrix', choices=list(HTML_THEMES), help="Theme for HTML output.")
+    animate_parser.add_argument('--ansi', default='truecolor', choices=ANSI_MODES, help="Color mode for ANSI output.")
+    animate_parser.add_argument('--timing', action='store_true', help="Print the conversion time of every frame to stderr.")
+    add_settings_arguments(animate_parser)
+    animate_parser.set_defaults(func=cmd_animate)
+
+    play_parser = subparsers.add_parser('play', help="Play an ANSI file written by 'animate' in the terminal.")
+    play_parser.add_argument('file', help="ANSI playback file.")
+    play_parser.add_argument('--loops', type=int, default=1, help="How many times to play the animation.")
+    play_parser.set_defaults(func=cmd_play)
+
+    serve_parser = subparsers.add_parser('serve', help="Run the local HTTP conversion service.")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Address to listen on.")
+    serve_parser.add_argument('--port', type=int, default=8000, help="Port to listen on.")
+    serve_parser.add_argument('-j', '--workers', type=int, help="Worker processes (default: CPU count).")
+    serve_parser.add_argument('--queue-size', type=int,
+                              help="Requests that may wait for a worker before new ones get 503 (default: twice the workers).")
+    serve_parser.add_argument('-v', '--verbose', action='store_true', help="Log every request.")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    bench_parser = subparsers.add_parser('benchmark', help="Time every pipeline stage on generated images (headless).")
+    bench_parser.add_argument('-o', '--output', default='benchmark.json', help="JSON file for the results.")
+    bench_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 12, 50], help="Image sizes in megapixels.")
+    bench_parser.add_argument('--modes', nargs='+', default=['RGB', 'RGBA', 'P'], choices=['RGB', 'RGBA', 'P'],
+                              help="Image modes to generate.")
+    bench_parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the fastest is kept.")
+    bench_parser.add_argument('-v', '--verbose', action='store_true', help="Print every stage time.")
+    add_settings_arguments(bench_parser)
+    bench_parser.set_defaults(func=cmd_benchmark)
+
+    bench_compare_parser = subparsers.add_parser('benchmark-compare',
+                                                 help="Compare two benchmark files; fail if a stage got slower.")
+    bench_compare_parser.add_argument('base', help="Baseline benchmark JSON.")
+    bench_compare_parser.add_argument('new', help="New benchmark JSON.")
+    bench_compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                      help="Allowed slowdown per stage as a fraction (0.10 = 10%%).")
+    bench_compare_parser.add_argument('--min-ms', type=float, default=1.0,
+                                      help="Ignore stages faster than this in both runs.")
+    bench_compare_parser.add_argument('-v', '--verbose', action='store_true', help="Print every stage, not only regressions.")
+    bench_compare_parser.set_defaults(func=cmd_benchmark_compare)
+
+    compare_parser = subparsers.add_parser('compare-order', help="Compare the quality and fast pipeline orders on one image.")
+    compare_parser.add_argument('image', help="Path to the input image.")
+    compare_parser.add_argument('--repeat', type=int, default=3, help="Runs per order; the fastest is reported.")
+    add_settings_arguments(compare_parser)
+    compare_parser.set_defaults(func=cmd_compare_order)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        return cmd_gui(args)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
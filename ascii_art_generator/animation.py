@@ -0,0 +1,284 @@
+"""
+Conversion of animated images (GIF, APNG, WebP) frame by frame.
+
+Frames are decoded lazily, one at a time, and converted in parallel worker
+processes. At most max_in_flight frames are decoded or waiting to be written
+at any moment, so memory does not grow with the length of the animation.
+Frames whose pixels repeat a recently seen frame are not converted again but
+reuse the earlier result. If a worker process dies, the pool is rebuilt
+and the frames it lost are converted again one at a time; a frame that
+kills its worker again is yielded with an error instead of a result.
+
+Two outputs are supported: an ANSI playback file (plain text frames that
+redraw the terminal in place, see play_ansi) and a self-contained animated
+HTML page.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+from html import escape
+import os
+import sys
+import time
+
+from PIL import Image, ImageSequence
+
+from .ansi import ANSI_RESET, ansi_text
+from .export import HTML_HEAD, HTML_TAIL, color_classes, write_color_rows
+from .settings import HTML_THEMES
+
+DEFAULT_FRAME_DURATION = 100  # ms, for frames that do not specify one
+DEDUP_WINDOW = 64             # Recent distinct frames remembered for reuse
+
+# ANSI escapes used by the playback file
+ANSI_CLEAR = '\x1b[2J'
+ANSI_HOME = '\x1b[H'
+ANSI_HIDE_CURSOR = '\x1b[?25l'
+ANSI_SHOW_CURSOR = '\x1b[?25h'
+# Frame durations are stored in an APC string, which terminals ignore
+ANSI_DELAY = '\x1b_delay={}\x1b\\'
+
+
+class AnimationFrame:
+    """One converted frame of an animation."""
+    def __init__(self, index, duration, result, repeat_of=None, error=None):
+        self.index = index          # Position in the animation
+        self.duration = duration    # Display time in milliseconds
+        self.result = result        # ConversionResult (text and color_art only), None on error
+        self.repeat_of = repeat_of  # Index of the earlier identical frame, or None
+        self.error = error          # Error message, or None on success
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def is_animated(source):
+    """Whether an image file has more than one frame."""
+    with Image.open(source) as image:
+        return getattr(image, 'n_frames', 1) > 1
+
+
+def iter_frames(source):
+    """Yield (index, RGBA frame, duration in ms) for every frame, decoding lazily."""
+    with Image.open(source) as image:
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            duration = frame.info.get('duration') or DEFAULT_FRAME_DURATION
+            yield index, frame.convert('RGBA'), int(duration)
+
+
+def _frame_key(frame):
+    return frame.size, hashlib.blake2b(frame.tobytes(), digest_size=16).digest()
+
+
+# --- Worker process ---
+
+_worker_engine = None
+
+
+def _init_worker(settings):
+    global _worker_engine
+    from .engine import ConversionEngine
+    _worker_engine = ConversionEngine(settings)
+
+
+class _FrameJob:
+    """A frame sent to the pool. The frame is kept until its result is in, so it can be resent."""
+    def __init__(self, frame):
+        self.frame = frame
+        self.future = None
+        self.pool = None
+        self.error = None
+
+    @property
+    def lost(self):
+        """Whether the job died with its worker and has not been rerun yet."""
+        if self.error is not None:
+            return False
+        wait([self.future])
+        return self.future.cancelled() or isinstance(self.future.exception(), BrokenProcessPool)
+
+
+def _convert_frame(frame):
+    """Convert one frame, returning only what the writers need."""
+    from .engine import ConversionResult
+    result = _worker_engine.convert(frame)
+    return ConversionResult(result.text, None, result.color_art, result.settings, result.elapsed)
+
+
+def convert_frames(source, settings=None, workers=None, max_in_flight=None):
+    """
+    Convert every frame of an animated image and yield AnimationFrames in order.
+
+    workers defaults to the CPU count and max_in_flight (frames decoded but
+    not yet yielded) to twice the worker count.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+    recent = OrderedDict()  # frame key -> (index, job) of recent distinct frames
+    queue = deque()         # (index, duration, job, repeat_of) in frame order
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,))
+
+    pool = new_pool()
+
+    def replace_pool(broken):
+        # Every job on a dead pool fails; only the first one replaces it
+        nonlocal pool
+        if pool is broken:
+            pool = new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(job):
+        try:
+            job.future = pool.submit(_convert_frame, job.frame)
+        except BrokenProcessPool:
+            replace_pool(pool)
+            job.future = pool.submit(_convert_frame, job.frame)
+        job.pool = pool
+
+    def recover():
+        # Rerun the lost frames one at a time, so only a frame that takes
+        # its worker down again is recorded as failed
+        for job in {id(job): job for _, _, job, _ in queue}.values():
+            if job.lost:
+                replace_pool(job.pool)
+                submit(job)
+                if job.lost:
+                    replace_pool(job.pool)
+                    job.error = f"Worker process died converting this frame: {job.future.exception()}"
+
+    def finish_oldest():
+        if queue[0][2].lost:
+            recover()
+        index, duration, job, repeat_of = queue.popleft()
+        if job.error is not None:
+            return AnimationFrame(index, duration, None, repeat_of, job.error)
+        result = job.future.result()
+        job.frame = None
+        return AnimationFrame(index, duration, result, repeat_of)
+
+    try:
+        for index, frame, duration in iter_frames(source):
+            if len(queue) >= max_in_flight:
+                yield finish_oldest()
+            key = _frame_key(frame)
+            if key in recent:
+                recent.move_to_end(key)
+                first_index, job = recent[key]
+                queue.append((index, duration, job, first_index))
+                continue
+            job = _FrameJob(frame)
+            submit(job)
+            recent[key] = (index, job)
+            if len(recent) > DEDUP_WINDOW:
+                recent.popitem(last=False)
+            queue.append((index, duration, job, None))
+        while queue:
+            yield finish_oldest()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+# --- Writers ---
+
+def write_ansi_animation(f, frames, mode='truecolor'):
+    """
+    Write frames as an ANSI playback file, colored in the given ANSI mode
+    for color results. Frames that failed are left out. Returns the number
+    of frames written.
+    """
+    count = 0
+    f.write(ANSI_CLEAR + ANSI_HIDE_CURSOR)
+    for frame in frames:
+        if not frame.ok:
+            continue
+        f.write(ANSI_HOME + ANSI_DELAY.format(frame.duration))
+        f.write(ansi_text(frame.result, mode).replace('\n', '\r\n'))
+        count += 1
+    f.write(ANSI_RESET + ANSI_SHOW_CURSOR + '\r\n')
+    return count
+
+
+ANIMATION_SCRIPT = """<script>
+const sequence = [{sequence}];
+const frames = document.querySelectorAll('pre[data-frame]');
+let step = 0, shown = null;
+function show() {{
+    const [frame, duration] = sequence[step];
+    if (shown) shown.hidden = true;
+    shown = frames[frame];
+    shown.hidden = false;
+    step = (step + 1) % sequence.length;
+    setTimeout(show, duration);
+}}
+show();
+</script>
+"""
+
+
+def write_html_animation(f, frames, theme='matrix'):
+    """
+    Write frames as an HTML page that plays the animation. Every distinct
+    frame is written once; repeats are played from the earlier copy. Frames
+    that failed are left out. Returns the number of frames written.
+    """
+    theme = HTML_THEMES.get(theme, HTML_THEMES['matrix'])
+    f.write(HTML_HEAD.format(classes='', **theme))
+    sequence = []        # (distinct frame number, duration) per frame
+    distinct = {}        # frame index -> distinct frame number
+    for frame in frames:
+        if not frame.ok:
+            continue
+        if frame.repeat_of is not None and frame.repeat_of in distinct:
+            sequence.append((distinct[frame.repeat_of], frame.duration))
+            continue
+        number = len(distinct)
+        distinct[frame.index] = number
+        sequence.append((number, frame.duration))
+        result = frame.result
+        if result.color_art is None:
+            f.write(f'<pre data-frame="{number}" hidden>{escape(result.text, quote=False)}</pre>\n')
+        else:
+            prefix = f'f{number}c'
+            ids, css = color_classes(result.color_art, result.settings, prefix)
+            f.write(f'<style>\n{css}</style>\n<pre data-frame="{number}" hidden>')
+            write_color_rows(f, result.color_art, ids, result.settings, prefix)
+            f.write('</pre>\n')
+    f.write(ANIMATION_SCRIPT.format(sequence=','.join(f'[{n},{d}]' for n, d in sequence)))
+    f.write(HTML_TAIL)
+    return len(sequence)
+
+
+def save_animation(file_path, frames, theme='matrix', ansi_mode='truecolor'):
+    """Save frames as animated HTML (.html) or an ANSI playback file (anything else)."""
+    with open(file_path, 'w', encoding='utf-8', newline='\n') as f:
+        if file_path.lower().endswith(('.html', '.htm')):
+            return write_html_animation(f, frames, theme)
+        return write_ansi_animation(f, frames, ansi_mode)
+
+
+def play_ansi(file_path, loops=1, out=None):
+    """Play an ANSI playback file in the terminal, honoring frame durations."""
+    out = out or sys.stdout
+    with open(file_path, encoding='utf-8') as f:
+        data = f.read()
+    frames = []
+    for chunk in data.split(ANSI_HOME)[1:]:
+        delay = DEFAULT_FRAME_DURATION
+        if chunk.startswith('\x1b_delay='):
+            header, chunk = chunk[len('\x1b_delay='):].split('\x1b\\', 1)
+            delay = int(header)
+        frames.append((chunk.replace(ANSI_RESET + ANSI_SHOW_CURSOR, ''), delay))
+    out.write(ANSI_CLEAR + ANSI_HIDE_CURSOR)
+    try:
+        for _ in range(max(1, loops)):
+            for text, delay in frames:
+                out.write(ANSI_HOME + text)
+                out.flush()
+                time.sleep(delay / 1000)
+    finally:
+        out.write(ANSI_SHOW_CURSOR + '\r\n')
+        out.flush()
@@ -0,0 +1,93 @@
+"""
+ANSI terminal output for color ASCII art.
+
+Cell colors are mapped to the terminal palette with array operations
+(truecolor keeps them exact, "256" picks the nearest xterm-256 cube or gray
+entry, "16" the nearest basic color). Each row is written as runs of equal
+color, so an escape sequence is only emitted where the color changes, and
+every row ends with a reset so lines stay independent in logs.
+"""
+import numpy as np
+
+from .grid import color_runs
+
+ANSI_RESET = '\x1b[0m'
+
+# xterm-256 color cube levels and the default xterm colors 0-15
+CUBE_LEVELS = np.array([0, 95, 135, 175, 215, 255])
+BASIC_COLORS = np.array([
+    (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0), (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+    (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0), (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255),
+])
+
+
+def xterm256_ids(colors):
+    """Nearest xterm-256 color (16-255) for every RGB triple of a uint8 array."""
+    colors = np.asarray(colors, dtype=np.int32)
+    # Nearest level of the 6x6x6 cube per channel: levels are 0, then 95 + 40*k
+    levels = np.where(colors < 48, 0, np.where(colors < 115, 1, (colors - 35) // 40))
+    cube = CUBE_LEVELS[levels]
+    cube_ids = 16 + 36 * levels[..., 0] + 6 * levels[..., 1] + levels[..., 2]
+    # Nearest of the 24 grays 8, 18, ..., 238
+    gray_steps = np.clip((colors.sum(axis=-1) // 3 - 3) // 10, 0, 23)
+    gray = (8 + 10 * gray_steps)[..., None]
+    cube_error = ((colors - cube) ** 2).sum(axis=-1)
+    gray_error = ((colors - gray) ** 2).sum(axis=-1)
+    return np.where(gray_error < cube_error, 232 + gray_steps, cube_ids)
+
+
+def ansi16_ids(colors):
+    """Nearest basic terminal color (0-15) for every RGB triple of a uint8 array."""
+    colors = np.asarray(colors, dtype=np.int32)
+    flat = colors.reshape(-1, 3)
+    ids = np.empty(len(flat), dtype=np.intp)
+    # Rows of at most 64k cells keep the (cells x 16) distance table small
+    for start in range(0, len(flat), 65536):
+        chunk = flat[start:start + 65536]
+        distances = ((chunk[:, None, :] - BASIC_COLORS[None, :, :]) ** 2).sum(axis=-1)
+        ids[start:start + 65536] = distances.argmin(axis=1)
+    return ids.reshape(colors.shape[:-1])
+
+
+def ansi_palette(color_art, mode='truecolor'):
+    """
+    Return (ids, escapes): a per-cell index and the foreground escape
+    sequence for every index.
+    """
+    if mode == 'truecolor':
+        ids, palette = color_art.color_ids()
+        return ids, [f'\x1b[38;2;{r};{g};{b}m' for r, g, b in palette.tolist()]
+    if mode == '256':
+        return xterm256_ids(color_art.colors), [f'\x1b[38;5;{n}m' for n in range(256)]
+    if mode == '16':
+        return ansi16_ids(color_art.colors), [f'\x1b[{30 + n if n < 8 else 82 + n}m' for n in range(16)]
+    raise ValueError(f"Unknown ANSI color mode: {mode}")
+
+
+def ansi_text(result, mode='truecolor'):
+    """
+    Render a ConversionResult for a terminal. Results without color data
+    are returned as plain text.
+    """
+    color_art = result.color_art
+    if color_art is None:
+        return result.text
+    settings = result.settings
+    double_width = settings.get('double_width', False)
+    add_spacing = settings.get('add_spacing', False)
+    cell_width = 1 + bool(double_width) + bool(add_spacing)
+    ids, escapes = ansi_palette(color_art, mode)
+
+    pieces = []
+    for y, line in enumerate(color_art.row_texts(double_width, add_spacing)):
+        starts, ends, run_ids = color_runs(ids[y])
+        pieces.extend(escapes[color_id] + line[start * cell_width:end * cell_width]
+                      for start, end, color_id in zip(starts.tolist(), ends.tolist(), run_ids.tolist()))
+        pieces.append(ANSI_RESET + '\n')
+    return ''.join(pieces)[:-1]
+
+
+def write_ansi(f, result, mode='truecolor'):
+    """Write a ConversionResult as ANSI text to the text file object f."""
+    f.write(ansi_text(result, mode))
+    f.write('\n')
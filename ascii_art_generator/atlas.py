@@ -0,0 +1,171 @@
+"""
+Glyph atlases: every character of a set rasterized into a small cell.
+
+glyph_tiles() keeps full-size renderings (used for raster export) in
+memory, keyed by characters and font size.
+
+The atlas is the ink coverage (0 to 1) of each glyph, rendered with a
+monospace font at RENDER_SIZE and area-averaged down to CELL_SIZE. It is
+built once per character set and cell size, kept in memory and cached on
+disk as .npz under the user's cache directory, keyed by the characters,
+the cell size and the font files used.
+
+Characters the first font does not have are taken from the next font in
+FONT_NAMES; a glyph is "missing" when it renders like a code point that no
+font defines.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Width and height in pixels of one matching cell; about the shape of a
+# terminal character
+CELL_SIZE = (6, 12)
+# Font size glyphs are drawn at before being reduced to a cell
+RENDER_SIZE = 48
+# Fonts tried in order for every character
+FONT_NAMES = ('DejaVuSansMono.ttf', 'DejaVuSans.ttf', 'LiberationMono-Regular.ttf', 'Menlo.ttc', 'consola.ttf', 'cour.ttf')
+# Bumped whenever rendering changes, so old cache files are not used
+ATLAS_VERSION = 1
+
+# A code point in a private use plane, rendered as the "missing glyph" box
+_MISSING = '\U0010fffd'
+
+_lock = threading.Lock()
+_atlases = {}
+_tiles = {}
+_fonts = {}
+
+
+def cache_dir():
+    """Directory for cached atlases (ASCII_ART_CACHE_DIR or the user cache dir)."""
+    if os.environ.get('ASCII_ART_CACHE_DIR'):
+        return os.environ['ASCII_ART_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ascii_art_generator')
+
+
+def load_fonts(size=RENDER_SIZE):
+    """The FONT_NAMES that can be found, loaded at size; Pillow's default font if none can."""
+    if size not in _fonts:
+        fonts = []
+        for name in FONT_NAMES:
+            try:
+                fonts.append(ImageFont.truetype(name, size))
+            except OSError:
+                continue
+        _fonts[size] = fonts or [ImageFont.load_default(size)]
+    return _fonts[size]
+
+
+def _font_id(font):
+    path = getattr(font, 'path', None)
+    if not path:
+        return 'default'
+    stat = os.stat(path)
+    return f'{path}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def render_glyphs(chars, size=RENDER_SIZE):
+    """
+    Draw every character white on black in a cell of the first font's
+    advance width and line height. Returns a (len(chars), height, width)
+    uint8 array.
+    """
+    fonts = load_fonts(size)
+    ascent, descent = fonts[0].getmetrics()
+    box = (max(1, round(fonts[0].getlength('M'))), ascent + descent)
+
+    def draw(char, font):
+        tile = Image.new('L', box, 0)
+        ImageDraw.Draw(tile).text((0, 0), char, fill=255, font=font)
+        return np.asarray(tile)
+
+    missing = [draw(_MISSING, font) for font in fonts]
+    tiles = []
+    for char in chars:
+        tile = None
+        for font, missing_tile in zip(fonts, missing):
+            tile = draw(char, font)
+            if char.isspace() or not np.array_equal(tile, missing_tile):
+                break
+        tiles.append(tile)
+    return np.stack(tiles)
+
+
+def glyph_tiles(chars, size):
+    """render_glyphs(chars, size), rendered once per characters and size."""
+    chars = ''.join(chars)
+    with _lock:
+        if (chars, size) not in _tiles:
+            _tiles[chars, size] = render_glyphs(chars, size)
+        return _tiles[chars, size]
+
+
+def _build_atlas(chars, cell_size):
+    tiles = render_glyphs(chars)
+    cells = [np.asarray(Image.fromarray(tile).resize(cell_size, Image.Resampling.BOX)) for tile in tiles]
+    return np.stack(cells).astype(np.float32) / 255
+
+
+def glyph_atlas(chars, cell_size=CELL_SIZE):
+    """
+    Return the (len(chars), height, width) float32 ink coverage of the
+    characters, from memory, from the disk cache or freshly rendered.
+    """
+    chars = ''.join(chars)
+    key = (chars, tuple(cell_size))
+    with _lock:
+        if key in _atlases:
+            return _atlases[key]
+
+        fonts = '|'.join(_font_id(font) for font in load_fonts())
+        digest = hashlib.blake2b(repr((ATLAS_VERSION, chars, tuple(cell_size), RENDER_SIZE, fonts)).encode(),
+                                 digest_size=12).hexdigest()
+        path = os.path.join(cache_dir(), f'atlas-{digest}.npz')
+        atlas = None
+        try:
+            with np.load(path) as data:
+                atlas = data['atlas']
+        except (OSError, KeyError, ValueError):
+            pass
+        if atlas is None or atlas.shape != (len(chars), cell_size[1], cell_size[0]):
+            atlas = _build_atlas(chars, cell_size)
+            try:
+                os.makedirs(cache_dir(), exist_ok=True)
+                temp = f'{path}.{os.getpid()}.tmp.npz'
+                np.savez(temp, atlas=atlas)
+                os.replace(temp, path)
+            except OSError:
+                pass # A read-only cache only costs the rendering next time
+        _atlases[key] = atlas
+        return atlas
+
+
+def match_glyphs(blocks, atlas):
+    """
+    Index of the nearest glyph for every row of blocks, an (n, height *
+    width) float32 array of cell ink from 0 (paper) to 1 (black).
+
+    Cells and glyphs are compared by shape (coverage minus its mean) and
+    by tone, where glyph tones are rescaled so the densest glyph counts as
+    black; otherwise thin glyphs could never stand for dark cells. Both
+    parts together are one squared distance, so all cells are scored
+    against all glyphs with a single matrix product.
+    """
+    flat = atlas.reshape(len(atlas), -1)
+    size = flat.shape[1]
+    means = flat.mean(axis=1)
+    tones = means / max(float(means.max()), 1e-6)
+    # Append the tone, weighted like a full cell of pixels, to the shape
+    glyphs = np.hstack([flat - means[:, None], (size ** 0.5 * tones)[:, None]]).astype(np.float32)
+
+    cell_means = blocks.mean(axis=1, keepdims=True)
+    cells = np.hstack([blocks - cell_means, size ** 0.5 * cell_means]).astype(np.float32)
+    # |c - g|^2 = |c|^2 - 2 c.g + |g|^2, and |c|^2 does not change the argmin
+    scores = cells @ (-2 * glyphs.T)
+    scores += np.einsum('ij,ij->i', glyphs, glyphs)
+    return scores.argmin(axis=1).astype(np.uint16)
@@ -0,0 +1,203 @@
+"""
+Batch conversion of many images with a process pool.
+
+Inputs may be image files, directories (searched recursively) or glob
+patterns. Every image runs through the same ConversionEngine pipeline as the
+GUI and is saved like "Save to File" does. At most max_in_flight images are
+queued at once, so memory stays bounded however many files are given, and a
+failing image is recorded without stopping the batch. If a worker process
+dies, the pool is rebuilt and the images that were in flight are rerun one
+at a time, so only the image that kills its worker is recorded as failed.
+An image whose output file another input already claimed is recorded as
+failed instead of overwriting it.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import glob
+import os
+import time
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.webp')
+OUTPUT_FORMATS = ('txt', 'html', 'md', 'png', 'webp', 'aag')
+
+
+def iter_sources(inputs):
+    """
+    Yield (path, relative_name) for every image matched by the inputs.
+    relative_name keeps a directory's sub-folder layout for the output.
+    """
+    seen = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        if path not in seen:
+                            seen.add(path)
+                            yield path, os.path.relpath(path, pattern)
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+            for path in matches:
+                if os.path.isdir(path) or path in seen:
+                    continue
+                seen.add(path)
+                yield path, os.path.basename(path)
+
+
+def output_path_for(relative_name, output_dir, fmt):
+    """Where the converted art for an input image is written."""
+    return os.path.join(output_dir, os.path.splitext(relative_name)[0] + '.' + fmt)
+
+
+class BatchItem:
+    """Outcome of converting one image."""
+    def __init__(self, source, output=None, elapsed=0.0, error=None):
+        self.source = source
+        self.output = output
+        self.elapsed = elapsed  # Seconds spent converting and saving in the worker
+        self.error = error      # Error message, or None on success
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BatchReport:
+    """All BatchItems of a run plus the overall wall time."""
+    def __init__(self, items, elapsed):
+        self.items = items
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        return [item for item in self.items if item.ok]
+
+    @property
+    def failed(self):
+        return [item for item in self.items if not item.ok]
+
+    @property
+    def throughput(self):
+        """Converted images per second of wall time."""
+        return len(self.succeeded) / self.elapsed if self.elapsed else 0.0
+
+
+# --- Worker process ---
+
+_worker_engine = None
+
+
+def _init_worker(settings):
+    global _worker_engine
+    from .engine import ConversionEngine
+    _worker_engine = ConversionEngine(settings)
+
+
+def _convert_one(source, output, theme):
+    """Convert and save one image in a worker; errors are returned, not raised."""
+    from .export import save_result
+    start = time.perf_counter()
+    try:
+        result = _worker_engine.convert(source)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        save_result(output, result, theme)
+    except Exception as e:
+        return BatchItem(source, None, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    return BatchItem(source, output, time.perf_counter() - start)
+
+
+def run_batch(inputs, output_dir, fmt='txt', settings=None, workers=None, max_in_flight=None,
+              theme='matrix', on_item=None):
+    """
+    Convert every image matched by inputs into output_dir.
+
+    workers defaults to the CPU count and max_in_flight to twice the worker
+    count. on_item, if given, is called with each BatchItem as it finishes.
+    Returns a BatchReport.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+
+    items = []
+    start = time.perf_counter()
+    pending = {}        # future -> (source, output, pool it runs on)
+    suspects = deque()  # (source, output) in flight when a worker died
+    claimed = {}        # normalized output path -> source writing it
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(settings,))
+
+    pool = new_pool()
+
+    def record(item):
+        items.append(item)
+        if on_item is not None:
+            on_item(item)
+
+    def replace_pool(broken):
+        # Every future on a dead pool fails; only the first one replaces it
+        nonlocal pool
+        if pool is broken:
+            pool = new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(source, output):
+        try:
+            future = pool.submit(_convert_one, source, output, theme)
+        except BrokenProcessPool:
+            replace_pool(pool)
+            future = pool.submit(_convert_one, source, output, theme)
+        pending[future] = (source, output, pool)
+
+    def collect(done, alone=False):
+        for future in done:
+            source, output, used = pending.pop(future)
+            try:
+                item = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (crash, out of memory, killed); any image on
+                # the pool may have caused it
+                replace_pool(used)
+                if not alone:
+                    suspects.append((source, output))
+                    continue
+                item = BatchItem(source, error=f"Worker process died converting this image: {e}")
+            except Exception as e:
+                item = BatchItem(source, error=f"{type(e).__name__}: {e}")
+            record(item)
+
+    def rerun_suspects():
+        # Rerun the images that were in flight one at a time, so only the
+        # one that takes its worker down is recorded as failed
+        if not suspects:
+            return
+        collect(wait(pending).done)
+        while suspects:
+            submit(*suspects.popleft())
+            collect(wait(pending).done, alone=True)
+
+    try:
+        for source, relative_name in iter_sources(inputs):
+            output = output_path_for(relative_name, output_dir, fmt)
+            # Glob matches are named by basename, so a/x.png and b/x.png (or
+            # x.png and x.jpg) would write the same file
+            key = os.path.normcase(os.path.abspath(output))
+            if key in claimed:
+                record(BatchItem(source, error=f"Output {output} is already written for {claimed[key]}"))
+                continue
+            claimed[key] = source
+            if len(pending) >= max_in_flight:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                rerun_suspects()
+            submit(source, output)
+        collect(wait(pending).done)
+        rerun_suspects()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    return BatchReport(items, time.perf_counter() - start)
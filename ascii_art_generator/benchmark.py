@@ -0,0 +1,184 @@
+"""
+Headless benchmarks for every stage of the conversion pipeline.
+
+    python -m ascii_art_generator benchmark -o bench.json --sizes 1 12 50
+    python -m ascii_art_generator benchmark-compare base.json bench.json --threshold 0.15
+
+Images are generated in memory (gradients, shapes and noise) so runs are
+reproducible without test files. Each stage is timed on its own with the
+inputs the pipeline would give it; the best of several repeats is kept.
+The color display is measured without Tk: palette quantization and the
+row decoding and run segmentation the GUI viewer does for one screenful
+of rows (VIEWPORT_ROWS) before handing the runs to the canvas.
+"""
+import io
+import json
+import platform
+import statistics
+import time
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from .engine import ConversionEngine, output_charset
+from .export import write_html
+from .grid import ASCIIGrid, color_runs
+from .raster import render_image
+from .settings import DEFAULT_SETTINGS, SETTING_CHOICES
+
+DEFAULT_SIZES_MP = (1, 12, 50)
+DEFAULT_MODES = ('RGB', 'RGBA', 'P')
+# Rows the GUI viewer draws at once, for the color display timing
+VIEWPORT_ROWS = 60
+
+
+def generate_image(megapixels, mode='RGB', seed=0):
+    """A reproducible 4:3 test image with gradients, shapes and noise."""
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(width * 3 / 4))
+    rng = np.random.default_rng(seed)
+    ys = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    xs = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[:, :, 0] = 255 * xs
+    pixels[:, :, 1] = 255 * ys
+    pixels[:, :, 2] = 128 + 127 * np.sin(12 * (xs + ys))
+    # A dark disc in the middle as a "subject" on a light border
+    disc = (xs - 0.5) ** 2 + (ys - 0.5) ** 2 < 0.08
+    pixels[:, :, :3][disc] //= 4
+    pixels[:, :, :3] = np.clip(pixels[:, :, :3] + rng.integers(-12, 13, (height, width, 3)), 0, 255)
+    pixels[:, :, 3] = np.where(disc, 255, 160)
+    image = Image.fromarray(pixels, 'RGBA')
+    if mode == 'RGB':
+        return image.convert('RGB')
+    if mode == 'P':
+        return image.convert('RGB').quantize(colors=256)
+    return image
+
+
+def _time(func, repeat):
+    """Run func repeat times; return (best seconds, median seconds, last result)."""
+    times = []
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times), result
+
+
+def benchmark_image(image, label, settings=None, repeat=3):
+    """Time every pipeline stage on one image; return a list of result dicts."""
+    engine = ConversionEngine(settings)
+    settings = engine.settings
+    color_settings = dict(settings, color_ascii=True)
+    results = []
+
+    def measure(stage, func):
+        best, median, value = _time(func, repeat)
+        results.append({'image': label, 'stage': stage, 'seconds': best, 'median': median})
+        return value
+
+    rgba = measure('load', lambda: engine._load_image(image.copy()))
+    measure('background', lambda: engine._intelligent_background_removal(rgba, settings['bg_threshold'], settings['bg_feather']))
+    measure('background_connected', lambda: engine._intelligent_background_removal(
+        rgba, settings['bg_threshold'], settings['bg_feather'], 'connected'))
+    rgb = rgba.convert('RGB')
+    for effect in SETTING_CHOICES['effects']:
+        if effect != 'none':
+            measure(f'effects:{effect}', lambda: engine._apply_effects(rgb, effect))
+    enhanced = measure('enhance', lambda: engine._apply_enhancements(rgba, dict(settings, brightness=1.1, contrast=1.2,
+                                                                               sharpness=1.3, saturation=1.2)))
+    flat = measure('transparency', lambda: engine._flatten_transparency(enhanced, settings['smart_background']))
+    resized = measure('resize', lambda: engine._intelligent_resize(flat, settings['width'], settings['preserve_detail'],
+                                                                   settings['aspect_correction']))
+    gray = measure('grayscale', lambda: engine._convert_to_grayscale(resized, settings))
+    glyphs = measure('map', lambda: engine._map_pixels_to_indices(gray, settings))
+    measure('map_dithered', lambda: engine._map_pixels_to_indices(gray, dict(settings, dithering=True)))
+    measure('map_clahe', lambda: engine._map_pixels_to_indices(gray, dict(settings, equalization='clahe')))
+    measure('map_structure', lambda: engine._map_cells_to_glyphs(flat, resized.size, settings))
+    measure('map_braille', lambda: engine._map_braille(flat, resized.size, settings))
+    measure('format', lambda: engine._format_glyphs(glyphs, None, settings))
+    charset = output_charset(color_settings)
+    color_art = measure('color_ascii', lambda: ASCIIGrid(glyphs, charset, np.asarray(resized)))
+    measure('format_color', lambda: engine._format_glyphs(glyphs, color_art, color_settings))
+
+    def color_display():
+        # A fresh grid each time so the quantization is not cached
+        grid = ASCIIGrid(glyphs, charset, np.asarray(resized))
+        ids, _ = grid.quantized_ids(settings['palette_size'])
+        runs = 0
+        for y in range(min(VIEWPORT_ROWS, grid.height)):
+            grid.row_text(y, settings['double_width'], settings['add_spacing'])
+            runs += len(color_runs(ids[y])[0])
+        return runs
+    measure('color_display', color_display)
+
+    result = engine.convert(image.copy(), color_settings)
+
+    def html_export():
+        buffer = io.StringIO()
+        write_html(buffer, result)
+        return buffer.tell()
+    measure('html_export', html_export)
+    measure('raster_export', lambda: render_image(result))
+    return results
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES_MP, modes=DEFAULT_MODES, settings=None, repeat=3, progress=None):
+    """Benchmark every size and mode; return the JSON-ready report."""
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'settings': dict(DEFAULT_SETTINGS, **(settings or {})),
+        },
+        'results': [],
+    }
+    for megapixels in sizes:
+        for mode in modes:
+            label = f'{megapixels:g}MP-{mode}'
+            image = generate_image(megapixels, mode)
+            results = benchmark_image(image, label, settings, repeat)
+            report['results'].extend(results)
+            del image
+            if progress is not None:
+                progress(label, results)
+    return report
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_reports(base, new, threshold=0.10, min_seconds=0.001):
+    """
+    Compare two benchmark reports.
+
+    Returns a list of (image, stage, base seconds, new seconds, change,
+    regressed) for the stages present in both. A stage regresses when it
+    got more than threshold slower (0.10 = 10%) and at least one of the
+    two times is above min_seconds, so timer noise on tiny stages is ignored.
+    """
+    base_times = {(r['image'], r['stage']): r['seconds'] for r in base['results']}
+    rows = []
+    for r in new['results']:
+        key = (r['image'], r['stage'])
+        if key not in base_times:
+            continue
+        before, after = base_times[key], r['seconds']
+        change = after / before - 1 if before > 0 else 0.0
+        regressed = change > threshold and max(before, after) >= min_seconds
+        rows.append((key[0], key[1], before, after, change, regressed))
+    return rows
@@ -0,0 +1,90 @@
+"""
+LRU cache for intermediate pipeline results.
+
+The engine stores the output of every pipeline stage under a key made of the
+source file and the settings that stage (and every stage before it) depends
+on. Entries are evicted least-recently-used first once the memory budget is
+exceeded.
+"""
+from collections import OrderedDict
+import threading
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def estimate_size(value):
+    """Rough number of bytes held by a cached value."""
+    if isinstance(value, Image.Image):
+        # Pillow stores multi-band images with 4 bytes per pixel
+        bands = len(value.getbands())
+        return value.width * value.height * (1 if bands == 1 else 4)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(v) for v in value)
+    if isinstance(value, str):
+        return len(value) * 4
+    return 64
+
+
+class StageCache:
+    """A memory-bounded LRU mapping of stage keys to stage outputs."""
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the cached value or None, counting a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries to stay within budget."""
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and memory use as a dictionary."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+        }
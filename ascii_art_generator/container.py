@@ -0,0 +1,208 @@
+"""
+Compact binary container (.aag) for conversion results.
+
+A container holds the glyph-index grid, the character set it indexes, the
+settings used and, for color art, either the exact RGB grid or palette ids
+plus a palette of at most 256 colors. Layout:
+
+    magic b'AAGR', version (u16), header length (u32), JSON header,
+    then the arrays, each starting at a 16 byte aligned offset
+
+The header lists the shape, dtype and offset of every array. Opening a
+container only reads the header; the arrays are memory-mapped on first use
+and rows are sliced from the mapping, so listing or previewing thousands
+of results never reads or parses them fully. A StoredResult behaves like a
+ConversionResult (text, color_art, settings), so the text, HTML, ANSI and
+image exporters render it directly.
+"""
+import json
+import struct
+
+import numpy as np
+
+from .engine import format_codes, output_charset
+from .grid import ASCIIGrid
+from .settings import merge_settings
+
+MAGIC = b'AAGR'
+CONTAINER_VERSION = 1
+CONTAINER_EXTENSION = '.aag'
+COLOR_STORAGE = ('rgb', 'palette')
+
+_PREFIX = struct.Struct('<4sHI')
+_ALIGN = 16
+
+
+def save_container(file_path, result, colors='rgb'):
+    """
+    Write a ConversionResult as a container. colors picks how color art is
+    stored: 'rgb' keeps the exact cell colors, 'palette' one byte per cell
+    plus the palette the result is displayed with (settings['palette_size']).
+    A result displayed with exact colors (palette_size 0) is stored as RGB
+    either way, so it renders the same after a round trip.
+    """
+    if colors not in COLOR_STORAGE:
+        raise ValueError(f"Unknown color storage: {colors}")
+    color_art = result.color_art
+    if not result.settings.get('palette_size'):
+        colors = 'rgb'
+    glyphs = result.glyphs if result.glyphs is not None else getattr(color_art, 'glyphs', None)
+    if glyphs is None:
+        raise ValueError("This result has no glyph grid to store.")
+    charset = color_art.charset if color_art is not None else output_charset(result.settings)
+    glyphs = np.asarray(glyphs).astype(np.uint16, copy=False)
+
+    arrays = {'glyphs': glyphs}
+    header = {'height': glyphs.shape[0], 'width': glyphs.shape[1], 'charset': ''.join(charset),
+              'settings': result.settings, 'colors': 'none'}
+    if color_art is not None and colors == 'rgb':
+        header['colors'] = 'rgb'
+        arrays['colors'] = color_art.colors
+    elif color_art is not None:
+        palette_size = result.settings['palette_size']
+        ids, palette = color_art.quantized_ids(palette_size)
+        header.update(colors='palette', palette_size=palette_size)
+        arrays['ids'], arrays['palette'] = ids.astype(np.uint8, copy=False), palette
+
+    # Offsets depend on the header length, which depends on the offsets;
+    # reserve room for them by laying out twice
+    header['arrays'] = {}
+    for _ in range(2):
+        encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        offset = _aligned(_PREFIX.size + len(encoded) + 64)
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+            offset = _aligned(offset + array.nbytes)
+        header['arrays'] = layout
+    encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    with open(file_path, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, CONTAINER_VERSION, len(encoded)))
+        f.write(encoded)
+        for name, array in arrays.items():
+            f.write(b'\0' * (layout[name]['offset'] - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def read_header(file_path):
+    """Read and check a container's JSON header without touching the arrays."""
+    with open(file_path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"Not an ASCII art container: {file_path}")
+        magic, version, length = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"Not an ASCII art container: {file_path}")
+        if version > CONTAINER_VERSION:
+            raise ValueError(f"Container version {version} is newer than this program supports.")
+        return json.loads(f.read(length).decode('utf-8'))
+
+
+def open_result(file_path):
+    """Open a container as a StoredResult. Only the header is read now."""
+    return StoredResult(file_path, read_header(file_path))
+
+
+class StoredResult:
+    """
+    A conversion result backed by a memory-mapped container. Rows are
+    read on demand; text and color_art are built on first use and work
+    with every exporter that takes a ConversionResult.
+    """
+    def __init__(self, file_path, header):
+        self.file_path = file_path
+        self.header = header
+        self.settings = merge_settings(header['settings'])
+        self.charset = list(header['charset'])
+        self.image = None
+        self.resized = None
+        self.profile = None
+        self.elapsed = 0.0
+        self.cache_hits = self.cache_misses = 0
+        self._map = None
+        self._grid = None
+        self._color_art = None
+        self._text = None
+
+    @property
+    def height(self):
+        return self.header['height']
+
+    @property
+    def width(self):
+        return self.header['width']
+
+    @property
+    def has_colors(self):
+        return self.header['colors'] != 'none'
+
+    def _array(self, name):
+        if self._map is None:
+            self._map = np.memmap(self.file_path, dtype=np.uint8, mode='r')
+        info = self.header['arrays'][name]
+        dtype = np.dtype(info['dtype'])
+        count = int(np.prod(info['shape'], dtype=np.int64)) * dtype.itemsize
+        return self._map[info['offset']:info['offset'] + count].view(dtype).reshape(info['shape'])
+
+    @property
+    def glyphs(self):
+        """The (H, W) glyph-index grid, memory-mapped."""
+        return self.grid.glyphs
+
+    @property
+    def grid(self):
+        """An ASCIIGrid of the glyphs (without colors) over the mapping."""
+        if self._grid is None:
+            self._grid = ASCIIGrid(self._array('glyphs'), self.charset)
+        return self._grid
+
+    def row_text(self, y, double_width=False, add_spacing=False):
+        """Row y as a string; only that row is read from the file."""
+        return self.grid.row_text(y, double_width, add_spacing)
+
+    def row_colors(self, y):
+        """The RGB colors of row y as a (W, 3) uint8 array, or None for mono art."""
+        kind = self.header['colors']
+        if kind == 'rgb':
+            return np.asarray(self._array('colors')[y])
+        if kind == 'palette':
+            return self._array('palette')[self._array('ids')[y]]
+        return None
+
+    @property
+    def color_art(self):
+        """ASCIIGrid with per-cell colors, or None for mono art."""
+        kind = self.header['colors']
+        if self._color_art is None and kind != 'none':
+            if kind == 'rgb':
+                self._color_art = ASCIIGrid(self._array('glyphs'), self.charset, self._array('colors'))
+            else:
+                ids, palette = np.asarray(self._array('ids')), np.asarray(self._array('palette'))
+                self._color_art = ASCIIGrid(self._array('glyphs'), self.charset, palette[ids])
+                # The stored ids are already the display quantization
+                self._color_art._quantized[self.header['palette_size']] = (ids, palette)
+        return self._color_art
+
+    @property
+    def text(self):
+        """The formatted plain text, as the engine would have produced it."""
+        if self._text is None:
+            self._text = format_codes(self.grid.codepoints[self.glyphs], self.settings, self.charset)
+        return self._text
+
+    @property
+    def lines(self):
+        return self.text.count('\n') + 1
+
+    @property
+    def chars(self):
+        return len(self.text)
+
+    def close(self):
+        """Drop the mapping (and everything built on it) so the file is released."""
+        self._map = self._grid = self._color_art = None
@@ -0,0 +1,52 @@
+"""
+Contrast-limited adaptive histogram equalization (CLAHE) with numpy.
+
+The image is split into a grid of tiles. All tile histograms are counted
+with a single bincount, clipped at the clip limit (the clipped counts are
+spread evenly over all levels) and turned into one mapping per tile. Each
+pixel then blends the mappings of its four nearest tile centers
+bilinearly, gathered for the whole image at once.
+"""
+import numpy as np
+
+
+def clahe(pixels, tiles=8, clip_limit=2.0):
+    """
+    Equalize a 2-D uint8 array. tiles is the number of tiles along each
+    axis (fewer on an axis shorter than that); clip_limit is the highest
+    histogram bin allowed, as a multiple of the average bin height.
+    """
+    pixels = np.asarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape
+    if not height or not width:
+        return pixels.copy()
+    tiles_y, tiles_x = max(1, min(tiles, height)), max(1, min(tiles, width))
+    tile_height, tile_width = -(-height // tiles_y), -(-width // tiles_x)
+    tile_pixels = tile_height * tile_width
+
+    # Pad with mirrored edges so the tiles cover the image evenly
+    padded = np.pad(pixels, ((0, tile_height * tiles_y - height), (0, tile_width * tiles_x - width)), mode='symmetric')
+    tile_ids = np.arange(tiles_y * tiles_x).reshape(tiles_y, 1, tiles_x, 1)
+    keys = tile_ids * 256 + padded.reshape(tiles_y, tile_height, tiles_x, tile_width)
+    hist = np.bincount(keys.ravel(), minlength=tiles_y * tiles_x * 256).reshape(tiles_y, tiles_x, 256).astype(np.float64)
+
+    if clip_limit > 0:
+        limit = max(1.0, clip_limit * tile_pixels / 256)
+        excess = np.maximum(hist - limit, 0).sum(axis=2, keepdims=True)
+        hist = np.minimum(hist, limit) + excess / 256
+    mappings = np.cumsum(hist, axis=2) * (255 / tile_pixels)
+
+    # Position of every row/column relative to the tile centers
+    def neighbours(size, count, step):
+        position = np.clip((np.arange(size) + 0.5) / step - 0.5, 0, count - 1)
+        low = np.floor(position).astype(np.intp)
+        high = np.minimum(low + 1, count - 1)
+        return low, high, position - low
+
+    y0, y1, wy = neighbours(height, tiles_y, tile_height)
+    x0, x1, wx = neighbours(width, tiles_x, tile_width)
+    y0, y1, wy = y0[:, None], y1[:, None], wy[:, None]
+    top = mappings[y0, x0, pixels] * (1 - wx) + mappings[y0, x1, pixels] * wx
+    bottom = mappings[y1, x0, pixels] * (1 - wx) + mappings[y1, x1, pixels] * wx
+    result = top * (1 - wy) + bottom * wy
+    return np.clip(np.rint(result), 0, 255).astype(np.uint8)
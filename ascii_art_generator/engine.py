@@ -0,0 +1,684 @@
+"""
+Headless conversion engine for the ASCII Art Generator.
+
+Everything in this module works without tkinter so it can be used from the
+command line, from scripts and on servers without a display.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+from .atlas import glyph_atlas, match_glyphs
+from .contrast import clahe
+from .dither import dither
+from .grid import ASCIIGrid, codes_text, layout_codes
+from .regions import border_connected
+from .settings import ASCII_SETS, BRAILLE_DOTS, merge_settings
+from .tiled import can_stream, load_tiled, open_unchecked
+
+
+# --- Pipeline Stages ---
+# Settings each stage depends on, in pipeline order. A stage's cache key is
+# made of its own settings plus those of every stage before it, so changing
+# a late-stage setting reuses all earlier results.
+PIPELINE_STAGES = [
+    ('load', ('tiled_processing', 'width', 'remove_bg', 'bg_mode', 'bg_threshold', 'bg_feather')),
+    ('prescale', ('pipeline_order', 'width')),
+    ('background', ('remove_bg', 'bg_mode', 'bg_threshold', 'bg_feather')),
+    ('effects', ('effects',)),
+    ('enhance', ('brightness', 'contrast', 'sharpness', 'saturation')),
+    ('transparency', ('smart_background',)),
+    ('resize', ('width', 'preserve_detail', 'aspect_correction')),
+    ('grayscale', ('color_mode', 'color_channel')),
+    ('mapping', ('char_set', 'mapping_mode', 'adaptive', 'equalization', 'clahe_tiles', 'clahe_clip', 'dithering', 'dither_algorithm', 'reverse_colors')),
+]
+
+
+# Connected background removal labels regions on an image at most this large
+BG_WORKING_SIZE = 512
+# Border colors compared against in connected background removal
+BG_BORDER_COLORS = 8
+
+# Bit of every dot in a Braille cell (2 columns x 4 rows); dots 1-6 run
+# down the columns, dots 7 and 8 are the bottom row
+BRAILLE_BITS = np.array([[0x01, 0x08], [0x02, 0x10], [0x04, 0x20], [0x40, 0x80]], dtype=np.uint8)
+
+# The "fast" pipeline order shrinks the image to this many times the output
+# width before background removal, effects and enhancements
+FAST_OVERSAMPLE = 2
+
+
+def _setting_matters(key, settings, stage=None):
+    """Whether a setting can change a stage's output given the other settings."""
+    if key == 'width' and stage == 'prescale':
+        return settings['pipeline_order'] == 'fast'
+    if stage == 'load' and key != 'tiled_processing' and not settings['tiled_processing']:
+        return False
+    if key in ('bg_mode', 'bg_threshold', 'bg_feather'):
+        return settings['remove_bg']
+    if key == 'color_channel':
+        return settings['color_mode'] == 'channel'
+    if key == 'equalization':
+        return settings['adaptive']
+    if key in ('clahe_tiles', 'clahe_clip'):
+        return settings['adaptive'] and settings['equalization'] == 'clahe'
+    if key == 'char_set':
+        return settings['mapping_mode'] != 'braille'
+    if key == 'dithering':
+        return settings['mapping_mode'] != 'structure'
+    if key == 'dither_algorithm':
+        return settings['dithering'] and settings['mapping_mode'] != 'structure'
+    return True
+
+
+def _image_size(source):
+    """Return (width, height) of an image path or PIL image without decoding it."""
+    if isinstance(source, (str, os.PathLike)):
+        with open_unchecked(source) as image:
+            return image.size
+    return source.size
+
+
+def _decode_scale(size, settings):
+    """
+    Largest power-of-two reduction that keeps the decoded image at least
+    decode_oversample times the output width. 0 disables reduced decoding,
+    except for files tiled processing asked for but cannot stream: those
+    are decoded as small as the tiled working resolution allows.
+    """
+    oversample = settings['decode_oversample'] or (FAST_OVERSAMPLE if settings['tiled_processing'] else 0)
+    if not oversample:
+        return 1
+    target = settings['width'] * oversample
+    scale = 1
+    while size[0] // (scale * 2) >= target:
+        scale *= 2
+    return scale
+
+
+def _source_key(source):
+    """Identify an image file by path, size and modification time."""
+    stat = os.stat(source)
+    return (os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+
+
+class ConversionCancelled(Exception):
+    """Raised by convert() when its cancellation token was cancelled."""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation for a running conversion. The engine checks the
+    token at every stage boundary.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ConversionCancelled()
+
+
+class ConversionResult:
+    """The output of one conversion."""
+    def __init__(self, text, image, color_art=None, settings=None, elapsed=0.0, cache_hits=0, cache_misses=0,
+                 glyphs=None, resized=None, profile=None):
+        self.text = text            # Formatted plain text
+        self.image = image          # Processed RGB image (before resize)
+        self.color_art = color_art  # ASCIIGrid with per-cell colors for color ASCII
+        self.glyphs = glyphs        # Glyph-index grid, one entry per character cell
+        self.resized = resized      # RGB image at output resolution the glyphs were mapped from
+        self.profile = profile      # StageProfiler with per-stage records, if one was used
+        self.settings = settings or {}
+        self.elapsed = elapsed      # Seconds spent in convert()
+        self.cache_hits = cache_hits      # Stages reused from the stage cache
+        self.cache_misses = cache_misses  # Stages that had to be computed
+
+    @property
+    def lines(self):
+        return self.text.count('\n') + 1
+
+    @property
+    def chars(self):
+        return len(self.text)
+
+
+class ConversionEngine:
+    """
+    Runs the full image-to-ASCII pipeline without any GUI.
+
+    Settings use the same keys as the GUI; missing keys fall back to
+    DEFAULT_SETTINGS. Pass a StageCache to reuse intermediate results
+    between conversions of the same file.
+    """
+    def __init__(self, settings=None, cache=None):
+        self.settings = merge_settings(settings)
+        self.cache = cache
+
+    def convert(self, source, settings=None, cancel=None, profiler=None):
+        """
+        Convert an image path or PIL image and return a ConversionResult.
+
+        If a CancelToken is given and gets cancelled, ConversionCancelled is
+        raised at the next stage boundary. If a StageProfiler is given, every
+        stage is timed and measured into it.
+        """
+        start = time.perf_counter()
+        settings = dict(self.settings, **(settings or {}))
+        source_size = _image_size(source)
+        # Tiled processing streams uncompressed files in bands straight to the
+        # working resolution, applying background removal on the way. Other
+        # files would be decoded whole anyway, so they take the normal path
+        tiled = settings['tiled_processing'] and isinstance(source, (str, os.PathLike)) and can_stream(source)
+        # Decode at a power-of-two fraction of full size, so most width changes
+        # keep the same decoded image
+        decode_scale = _decode_scale(source_size, settings)
+        # Filter radii are tuned for the full-size image; scale them by the
+        # width the filters actually run at, in every order
+        radius_scale = 1.0 / decode_scale
+        if settings['pipeline_order'] == 'fast':
+            radius_scale = min(radius_scale, settings['width'] * FAST_OVERSAMPLE / source_size[0])
+        # Connected background removal needs the whole image, so tiled mode
+        # only applies the per-pixel color mode while reading bands
+        tiled_bg = tiled and settings['remove_bg'] and settings['bg_mode'] == 'color'
+        # The smart background color accumulated from the full-size bands is
+        # only valid while effects and enhancements leave the pixels alone;
+        # otherwise it is computed from the enhanced working image
+        tiled_smart_color = (tiled and (tiled_bg or not settings['remove_bg']) and settings['effects'] == 'none'
+                             and all(settings[key] == 1.0 for key in ('brightness', 'contrast', 'sharpness', 'saturation')))
+        if tiled:
+            radius_scale = min(1.0, settings['width'] * FAST_OVERSAMPLE / source_size[0])
+        # Only files can be cached; an in-memory image may change under us
+        source_key = None
+        if self.cache is not None and isinstance(source, (str, os.PathLike)):
+            source_key = _source_key(source) + (decode_scale,)
+
+        # --- Image Processing Pipeline ---
+        steps = {
+            # Ensure image is in a workable mode (RGBA for transparency handling)
+            'load': lambda: (load_tiled(source, settings['width'] * FAST_OVERSAMPLE, tiled_bg, settings['bg_threshold'],
+                                        settings['bg_feather'], settings['memory_budget_mb'])
+                             if tiled else self._load_image(source, decode_scale)),
+            # "fast" order: shrink first so the filters below run on fewer pixels
+            'prescale': lambda: self._prescale(stage('load'), settings['width']),
+            # 1. Background Removal
+            'background': lambda: self._intelligent_background_removal(stage('prescale'), settings['bg_threshold'], settings['bg_feather'] * radius_scale,
+                                                                       settings['bg_mode']),
+            # 2. Pre-processing Effects
+            'effects': lambda: self._apply_effects_rgba(stage('background'), settings['effects'], radius_scale),
+            # 3. Image Enhancements (Brightness, Contrast, etc.)
+            'enhance': lambda: self._apply_enhancements(stage('effects'), settings),
+            # 4. Handle transparency
+            'transparency': lambda: self._flatten_transparency(stage('enhance'), settings['smart_background'],
+                                                               stage('load').info.get('smart_color') if tiled_smart_color else None),
+            # 5. Resize
+            'resize': lambda: self._intelligent_resize(stage('transparency'), settings['width'], settings['preserve_detail'], settings['aspect_correction']),
+            # 6. Grayscale Conversion
+            'grayscale': lambda: self._convert_to_grayscale(stage('resize'), settings),
+            # 7. ASCII Mapping (by brightness, or by shape or Braille dots from the pre-resize image)
+            'mapping': lambda: self._map_mode(stage, settings),
+        }
+        skipped = {
+            'prescale': settings['pipeline_order'] != 'fast' or tiled,
+            'background': not settings['remove_bg'] or tiled_bg,
+            'effects': settings['effects'] == 'none',
+        }
+        outputs = {}
+        counts = {'hits': 0, 'misses': 0}
+
+        def stage(name):
+            # Stages run lazily, so a cache hit on a late stage never touches
+            # the earlier ones
+            if name not in outputs:
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                if skipped.get(name):
+                    previous = PIPELINE_STAGES[[n for n, _ in PIPELINE_STAGES].index(name) - 1][0]
+                    outputs[name] = stage(previous)
+                elif profiler is None:
+                    outputs[name] = self._cached_stage(name, source_key, settings, steps[name], counts)
+                else:
+                    with profiler.stage(name) as record:
+                        hits = counts['hits']
+                        outputs[name] = self._cached_stage(name, source_key, settings, steps[name], counts)
+                        record['cached'] = counts['hits'] > hits
+                        if isinstance(outputs[name], Image.Image):
+                            record['size'] = '%dx%d %s' % (outputs[name].size + (outputs[name].mode,))
+            return outputs[name]
+
+        # --- ASCII Generation ---
+        char_set = output_charset(settings)
+        glyphs = stage('mapping')
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        color_art = None
+        if settings['color_ascii']:
+            color_art = ASCIIGrid(glyphs, char_set, np.asarray(stage('resize')))
+        # 8. Formatting
+        if profiler is None:
+            text = self._format_glyphs(glyphs, color_art, settings)
+        else:
+            with profiler.stage('formatting'):
+                text = self._format_glyphs(glyphs, color_art, settings)
+
+        return ConversionResult(text, stage('transparency'), color_art, settings, time.perf_counter() - start,
+                                counts['hits'], counts['misses'], glyphs, stage('resize'), profiler)
+
+    def _format_glyphs(self, glyphs, color_art, settings):
+        """Format a glyph grid (or its ASCIIGrid for color output) as text."""
+        if color_art is not None:
+            return format_codes(color_art.codepoints[color_art.glyphs], settings)
+        return format_codes(_charset_codepoints(output_charset(settings))[glyphs], settings)
+
+    def _cached_stage(self, name, source_key, settings, compute, counts):
+        """Return a stage's output from the cache, computing and storing it on a miss."""
+        if source_key is None:
+            return compute()
+
+        keys = []
+        for stage_name, stage_settings in PIPELINE_STAGES:
+            keys.extend((key, settings[key]) for key in stage_settings if _setting_matters(key, settings, stage_name))
+            if stage_name == name:
+                break
+        cache_key = (source_key, name, tuple(keys))
+
+        value = self.cache.get(cache_key)
+        if value is None:
+            counts['misses'] += 1
+            value = compute()
+            self.cache.put(cache_key, value)
+        else:
+            counts['hits'] += 1
+        return value
+
+    def _load_image(self, source, scale=1):
+        """
+        Open the source, decoded at 1/scale of its size, and return it as an
+        RGBA image.
+
+        JPEGs are decoded directly at reduced size (draft mode); anything
+        still larger than needed is shrunk with an integer box reduce before
+        the RGBA conversion copies it.
+        """
+        image = Image.open(source) if isinstance(source, (str, os.PathLike)) else source
+        if scale > 1:
+            target_width = -(-image.width // scale)
+            target_height = -(-image.height // scale)
+            if image.format == 'JPEG':
+                image.draft(None, (target_width, target_height))
+            if image.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            factor = image.width // target_width
+            if factor >= 2:
+                image = image.reduce(factor)
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        image.load()
+        return image
+
+    # --- Image Processing Sub-routines ---
+
+    def _prescale(self, image, target_width):
+        """Shrink an image to FAST_OVERSAMPLE times the output width (never enlarges)."""
+        working_width = target_width * FAST_OVERSAMPLE
+        if image.width <= working_width:
+            return image
+        working_height = max(1, round(image.height * working_width / image.width))
+        return image.resize((working_width, working_height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    def _intelligent_background_removal(self, image, threshold, feather_radius, mode='color'):
+        """
+        Remove background from an RGBA image. 'color' removes every pixel
+        close to the corner color; 'connected' only removes background
+        regions that touch the image border.
+        """
+        if image.mode != 'RGBA':
+            return image
+        if mode == 'connected':
+            return self._connected_background_removal(image, threshold, feather_radius)
+
+        img_array = np.array(image)
+        # Use corners to guess background color
+        corners = [img_array[0, 0], img_array[0, -1], img_array[-1, 0], img_array[-1, -1]]
+        bg_color = np.mean([c for c in corners if c[3] > 0], axis=0)[:3] if any(c[3] > 0 for c in corners) else (255, 255, 255)
+
+        distances = np.sqrt(np.sum((img_array[:, :, :3] - bg_color) ** 2, axis=2))
+        alpha_mask = np.where(distances < threshold, 0, 255).astype(np.uint8)
+
+        # Feathering using Pillow instead of Scipy
+        if feather_radius > 0:
+            mask_img = Image.fromarray(alpha_mask, 'L')
+            feathered_mask = mask_img.filter(ImageFilter.GaussianBlur(radius=feather_radius))
+            alpha_mask = np.array(feathered_mask)
+
+        img_array[:, :, 3] = alpha_mask
+        return Image.fromarray(img_array, 'RGBA')
+
+    def _connected_background_removal(self, image, threshold, feather_radius):
+        """
+        Remove the background regions connected to the border. Works on a
+        reduced copy with integer squared distances to the most common
+        border colors, so gradients and multi-colored borders are handled,
+        then scales the mask back up.
+        """
+        factor = max(1, -(-max(image.size) // BG_WORKING_SIZE))
+        small = np.asarray(image.reduce(factor) if factor > 1 else image)
+
+        # Representative border colors of the visible border pixels
+        border = np.concatenate([small[0], small[-1], small[1:-1, 0], small[1:-1, -1]])
+        border = border[border[:, 3] > 0][:, :3]
+        if len(border):
+            quantized = Image.fromarray(border[None], 'RGB').quantize(colors=BG_BORDER_COLORS, method=Image.Quantize.MEDIANCUT)
+            used = np.unique(np.asarray(quantized))
+            palette = np.array(quantized.getpalette()[:3 * (used.max() + 1)], dtype=np.int32).reshape(-1, 3)[used]
+        else:
+            palette = np.array([[255, 255, 255]], dtype=np.int32)
+
+        # Background candidates: transparent, or near one of the border colors
+        pixels = small[:, :, :3].astype(np.int32)
+        nearest = np.full(pixels.shape[:2], np.iinfo(np.int32).max, dtype=np.int32)
+        for color in palette:
+            np.minimum(nearest, ((pixels - color) ** 2).sum(axis=2), out=nearest)
+        candidates = (nearest < int(threshold) ** 2) | (small[:, :, 3] == 0)
+
+        keep = np.where(border_connected(candidates), 0, 255).astype(np.uint8)
+        mask = Image.fromarray(keep, 'L')
+        # Feather at the reduced size; the bilinear upscale keeps it smooth
+        if feather_radius > 0:
+            mask = mask.filter(ImageFilter.GaussianBlur(radius=feather_radius / factor))
+        if mask.size != image.size:
+            mask = mask.resize(image.size, Image.Resampling.BILINEAR)
+            if feather_radius <= 0:
+                mask = mask.point(lambda v: 255 if v >= 128 else 0)
+        result = image.copy()
+        result.putalpha(mask)
+        return result
+
+    def _apply_effects(self, image, effect_type, radius_scale=1.0):
+        """
+        Apply pre-processing visual effects. radius_scale shrinks the blur and
+        unsharp radii for images that were downsampled first; the 3x3 kernel
+        filters (edges, emboss, smooth) have no radius to scale.
+        """
+        effects = {
+            "enhance": lambda img: img.filter(ImageFilter.UnsharpMask(radius=1.5 * radius_scale, percent=200, threshold=3)),
+            "smooth": lambda img: img.filter(ImageFilter.GaussianBlur(radius=0.5 * radius_scale)).filter(ImageFilter.EDGE_ENHANCE),
+            "edge": lambda img: ImageOps.invert(img.filter(ImageFilter.FIND_EDGES)).filter(ImageFilter.SMOOTH),
+            "artistic": lambda img: ImageOps.autocontrast(img.filter(ImageFilter.EMBOSS)),
+            "dramatic": lambda img: ImageOps.autocontrast(img, cutoff=5).filter(ImageFilter.UnsharpMask(radius=2 * radius_scale, percent=300, threshold=5))
+        }
+        if effect_type in effects:
+            return effects[effect_type](image)
+        return image
+
+    def _apply_effects_rgba(self, image, effect_type, radius_scale=1.0):
+        """Apply an effect to the RGB channels of an RGBA image, keeping its alpha."""
+        # Effects work on RGB, so convert, apply, then potentially convert back
+        alpha = image.split()[-1]
+        rgb_image = image.convert("RGB")
+        processed_rgb = self._apply_effects(rgb_image, effect_type, radius_scale)
+        processed_rgb.putalpha(alpha)
+        return processed_rgb
+
+    def _apply_enhancements(self, image, settings):
+        """Apply brightness, contrast, sharpness and saturation to an RGBA image."""
+        rgb_image = image.convert("RGB") # Enhancements work on RGB
+        enhancers = {
+            'brightness': ImageEnhance.Brightness,
+            'contrast': ImageEnhance.Contrast,
+            'sharpness': ImageEnhance.Sharpness,
+            'saturation': ImageEnhance.Color,
+        }
+        for key, enhancer_class in enhancers.items():
+            if settings[key] != 1.0:
+                enhancer = enhancer_class(rgb_image)
+                rgb_image = enhancer.enhance(settings[key])
+
+        alpha = image.split()[-1]
+        rgb_image.putalpha(alpha)
+        return rgb_image
+
+    def _flatten_transparency(self, image, smart_background, smart_color=None):
+        """
+        Composite an RGBA image onto a solid background and return RGB.
+        smart_color, if given, is the precomputed average opaque color.
+        """
+        if image.mode != 'RGBA':
+            return image.convert('RGB')
+
+        bg_color = (255, 255, 255) # Default white
+        if smart_background and smart_color is not None:
+            bg_color = tuple(255 - int(c) for c in smart_color)
+        elif smart_background:
+            # Simple smart bg: use inverted average color of non-transparent parts
+            non_transparent = np.array(image)[np.array(image)[:,:,3] > 128]
+            if len(non_transparent) > 0:
+                avg_color = np.mean(non_transparent[:, :3], axis=0)
+                bg_color = tuple(255 - int(c) for c in avg_color)
+
+        background = Image.new('RGBA', image.size, bg_color + (255,))
+        background.paste(image, mask=image)
+        return background.convert('RGB')
+
+    def _intelligent_resize(self, image, target_width, preserve_detail, aspect_correction):
+        """Resize image with detail preservation and aspect ratio correction."""
+        width, height = image.size
+        aspect_ratio = height / width
+        char_aspect = 0.55 if aspect_correction else 1.0
+        new_height = int(target_width * aspect_ratio * char_aspect)
+
+        if preserve_detail and target_width < width:
+            image = image.filter(ImageFilter.UnsharpMask(radius=0.5, percent=100, threshold=1))
+
+        return image.resize((target_width, new_height), Image.Resampling.LANCZOS)
+
+    def _convert_to_grayscale(self, image, settings):
+        """Convert an RGB image to grayscale using the selected method."""
+        mode = settings['color_mode']
+        if mode == 'weighted':
+            # This is the standard, perceptually-weighted conversion
+            return image.convert('L')
+        elif mode == 'desaturate':
+            return ImageOps.grayscale(image)
+        elif mode == 'channel':
+            r, g, b = image.split()
+            channel_map = {'red': r, 'green': g, 'blue': b}
+            return channel_map.get(settings['color_channel'], r)
+        return image.convert('L') # Default fallback
+
+    def _build_position_lut(self, pixels, settings):
+        """
+        Build a 256-entry table mapping gray levels to continuous glyph
+        positions in [0, len(char_set)), with histogram equalization applied.
+        """
+        char_set = ASCII_SETS[settings['char_set']]
+        levels = np.arange(256, dtype=np.float64)
+
+        if settings['adaptive']:
+            # Histogram equalization for better contrast. With 256 bins over
+            # (0, 255) every integer level lands in its own bin, so bincount
+            # gives the same histogram as np.histogram.
+            hist = np.bincount(pixels.ravel(), minlength=256)
+            bins = np.linspace(0, 255, 257)
+            cdf = hist.cumsum()
+            cdf_normalized = cdf / cdf[-1]
+            levels = np.interp(levels, bins[:-1], cdf_normalized * 255)
+
+        return levels * (len(char_set) / 256)
+
+    def _local_equalization(self, pixels, settings):
+        """
+        With CLAHE selected, equalize the pixels tile by tile and return
+        them with settings that turn off the global equalization;
+        otherwise return both unchanged.
+        """
+        if settings['adaptive'] and settings['equalization'] == 'clahe':
+            return clahe(pixels, settings['clahe_tiles'], settings['clahe_clip']), dict(settings, adaptive=False)
+        return pixels, settings
+
+    def _glyph_order(self, settings):
+        """Return the table that maps glyph indices to output indices (reversal)."""
+        char_set = ASCII_SETS[settings['char_set']]
+        if not settings['reverse_colors']:
+            return np.arange(len(char_set), dtype=np.uint16)
+        # Duplicate glyphs (e.g. "Blocks") reverse via their first occurrence
+        first_index = np.array([char_set.index(c) for c in char_set])
+        return (len(char_set) - 1 - first_index).astype(np.uint16)
+
+    def _build_ascii_lut(self, pixels, settings):
+        """
+        Build a 256-entry table mapping gray levels to glyph indices.
+
+        Histogram equalization and character reversal are folded into the
+        table, so mapping an image is a single lookup per pixel.
+        """
+        char_set = ASCII_SETS[settings['char_set']]
+        indices = self._build_position_lut(pixels, settings).astype(np.intp)
+        indices = np.clip(indices, 0, len(char_set) - 1)
+        return self._glyph_order(settings)[indices]
+
+    def _map_pixels_to_indices(self, image, settings):
+        """Map grayscale pixel values to a grid of glyph indices."""
+        pixels, settings = self._local_equalization(np.asarray(image, dtype=np.uint8), settings)
+        if settings['dithering']:
+            # Dither the continuous positions instead of flooring them
+            positions = self._build_position_lut(pixels, settings)[pixels]
+            glyphs = dither(positions, len(ASCII_SETS[settings['char_set']]), settings['dither_algorithm'])
+            return self._glyph_order(settings)[glyphs]
+        return self._build_ascii_lut(pixels, settings)[pixels]
+
+    def _map_mode(self, stage, settings):
+        """Run the mapping of the selected mapping mode on the pipeline stages."""
+        if settings['mapping_mode'] == 'structure':
+            return self._map_cells_to_glyphs(stage('transparency'), stage('resize').size, settings)
+        if settings['mapping_mode'] == 'braille':
+            return self._map_braille(stage('transparency'), stage('resize').size, settings)
+        return self._map_pixels_to_indices(stage('grayscale'), settings)
+
+    def _cell_ink(self, image, grid_size, cell_size, settings):
+        """
+        Resize image to cell_size pixels per cell of a grid_size (columns,
+        rows) grid and return its ink: 0 for white, 1 for black (the other
+        way round with reverse_colors), equalized like the brightness mapping.
+        """
+        columns, rows = grid_size
+        cells = image.resize((columns * cell_size[0], rows * cell_size[1]), Image.Resampling.LANCZOS)
+        pixels, settings = self._local_equalization(np.asarray(self._convert_to_grayscale(cells, settings), dtype=np.uint8), settings)
+        levels = self._build_position_lut(pixels, settings) / len(ASCII_SETS[settings['char_set']])
+        if not settings['reverse_colors']:
+            levels = 1 - levels
+        return levels.astype(np.float32)[pixels]
+
+    def _map_cells_to_glyphs(self, image, grid_size, settings):
+        """
+        Map every output cell to the glyph whose shape is closest to the
+        cell's block of pixels, for a grid of grid_size (columns, rows).
+        """
+        atlas = glyph_atlas(ASCII_SETS[settings['char_set']])
+        _, cell_height, cell_width = atlas.shape
+        columns, rows = grid_size
+        ink = self._cell_ink(image, grid_size, (cell_width, cell_height), settings)
+        blocks = ink.reshape(rows, cell_height, columns, cell_width).swapaxes(1, 2).reshape(rows * columns, -1)
+        return match_glyphs(blocks, atlas).reshape(rows, columns)
+
+    def _map_braille(self, image, grid_size, settings):
+        """
+        Map every output cell to a Braille pattern (an index into
+        BRAILLE_DOTS) from a 2x4 dot block of the image, thresholded or
+        dithered, so each cell shows 8 pixels.
+        """
+        columns, rows = grid_size
+        ink = self._cell_ink(image, grid_size, (2, 4), settings)
+        if settings['dithering']:
+            dots = dither(np.minimum(ink * 2, 1.999), 2, settings['dither_algorithm']).astype(bool)
+        else:
+            dots = ink >= 0.5
+        # Weight every dot by its bit and add the bits up per cell
+        bits = dots.reshape(rows, 4, columns, 2) * BRAILLE_BITS[None, :, None, :]
+        return bits.sum(axis=(1, 3), dtype=np.uint16)
+
+
+def convert(source, settings=None):
+    """Convenience wrapper: convert one image with the given settings."""
+    return ConversionEngine(settings).convert(source)
+
+
+def format_codes(codes, settings, char_set=None):
+    """
+    Format an (H, W) code point array as text. Double width, spacing and
+    the border are array operations and the text is decoded once. char_set
+    defaults to output_charset(settings).
+    """
+    # Reversal already happened in the mapping table; only the spacing
+    # separator still needs it, since it used to be reversed with the line
+    separator = ' '
+    if settings['reverse_colors']:
+        char_set = char_set if char_set is not None else output_charset(settings)
+        if separator in char_set:
+            separator = char_set[::-1][char_set.index(separator)]
+
+    codes = layout_codes(codes, settings['double_width'], settings['add_spacing'], separator, between_columns=True)
+    if not settings['add_border']:
+        return codes_text(codes)
+
+    border_char = settings['border_char']
+    border = np.frombuffer(border_char.encode('utf-32-le'), dtype='<u4')
+    height, width = codes.shape
+    space = np.array([ord(' ')], dtype='<u4')
+    left = np.broadcast_to(np.concatenate([border, space]), (height, len(border) + 1))
+    right = np.broadcast_to(np.concatenate([space, border]), (height, len(border) + 1))
+    if not height:
+        return border_char * 4 + '\n' + border_char * 4
+    border_line = border_char * (width + 4)
+    return '\n'.join([border_line, codes_text(np.hstack([left, codes, right])), border_line])
+
+
+def output_charset(settings):
+    """The characters glyph indices refer to: BRAILLE_DOTS in Braille mode, else the character set."""
+    if settings['mapping_mode'] == 'braille':
+        return BRAILLE_DOTS
+    return ASCII_SETS[settings['char_set']]
+
+
+def _charset_codepoints(char_set):
+    """Return a list of characters as a uint32 code point array."""
+    return np.array([ord(c) for c in char_set], dtype='<u4')
+
+
+def compare_pipeline_orders(source, settings=None, repeat=3):
+    """
+    Convert an image with the "quality" and the "fast" pipeline order and
+    report timings and how closely the fast result matches.
+
+    Returns a dictionary with the best-of-repeat time of each order, the
+    speedup, the fraction of identical characters, the mean glyph index
+    difference and the PSNR (dB) between the two output-resolution images.
+    """
+    results = {}
+    for order in ('quality', 'fast'):
+        engine = ConversionEngine(dict(settings or {}, pipeline_order=order))
+        runs = [engine.convert(source) for _ in range(max(1, repeat))]
+        results[order] = (min(run.elapsed for run in runs), runs[-1])
+
+    quality_time, quality = results['quality']
+    fast_time, fast = results['fast']
+    glyph_diff = np.abs(quality.glyphs.astype(np.int16) - fast.glyphs.astype(np.int16))
+    pixel_error = np.mean((np.asarray(quality.resized, dtype=np.float64) - np.asarray(fast.resized, dtype=np.float64)) ** 2)
+    return {
+        'quality_seconds': quality_time,
+        'fast_seconds': fast_time,
+        'speedup': quality_time / fast_time if fast_time else float('inf'),
+        'identical_chars': float(np.mean(glyph_diff == 0)),
+        'mean_glyph_diff': float(glyph_diff.mean()),
+        'psnr_db': float('inf') if pixel_error == 0 else float(10 * np.log10(255 ** 2 / pixel_error)),
+    }
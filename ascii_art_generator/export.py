@@ -0,0 +1,102 @@
+"""
+Exporters that write a finished ConversionResult to disk.
+
+The HTML exporter streams the already generated result row by row, merges
+runs of the same color into one <span> and styles them through shared CSS
+classes for a quantized palette, so time and file size grow linearly with
+the art and the same result always produces the same bytes.
+
+PNG and WebP go through the raster module, .aag containers through the
+container module.
+"""
+from html import escape
+
+import numpy as np
+
+from .ansi import write_ansi
+from .grid import color_runs, hex_color
+from .settings import HTML_THEMES
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>ASCII Art</title>
+    <style>
+        body {{ background: {bg}; color: {color}; font-family: '{font}', monospace; white-space: pre; line-height: 1; font-size: 10px; }}
+        pre {{ margin: 0; font: inherit; }}
+{classes}    </style>
+</head>
+<body>"""
+
+HTML_TAIL = """</body>
+</html>"""
+
+
+def write_html(f, result, theme='matrix'):
+    """Stream a ConversionResult as an HTML page to the text file object f."""
+    theme = HTML_THEMES.get(theme, HTML_THEMES['matrix'])
+    color_art = result.color_art
+    settings = result.settings
+
+    if color_art is None:
+        f.write(HTML_HEAD.format(classes='', **theme))
+        f.write('<pre>')
+        f.write(escape(result.text, quote=False))
+        f.write('</pre>')
+        f.write(HTML_TAIL)
+        return
+
+    ids, classes = color_classes(color_art, settings)
+    f.write(HTML_HEAD.format(classes=classes, **theme))
+    f.write('<pre>')
+    write_color_rows(f, color_art, ids, settings)
+    f.write('</pre>')
+    f.write(HTML_TAIL)
+
+
+def color_classes(color_art, settings, prefix='c'):
+    """
+    Quantize the colors of an ASCIIGrid for display and return (ids, css):
+    the per-cell palette ids and one CSS rule per palette entry in use.
+    """
+    ids, palette = color_art.quantized_ids(settings.get('palette_size', 0))
+    css = ''.join(f"        .{prefix}{color_id} {{ color: {hex_color(palette[color_id])}; }}\n"
+                  for color_id in np.unique(ids).tolist())
+    return ids, css
+
+
+def write_color_rows(f, color_art, ids, settings, prefix='c'):
+    """Write the rows of an ASCIIGrid as runs of <span class="{prefix}N">."""
+    double_width = settings.get('double_width', False)
+    add_spacing = settings.get('add_spacing', False)
+    cell_width = 1 + bool(double_width) + bool(add_spacing)
+
+    for y, line in enumerate(color_art.row_texts(double_width, add_spacing)):
+        starts, ends, run_ids = color_runs(ids[y])
+        f.write(''.join(f'<span class="{prefix}{color_id}">{escape(line[start * cell_width:end * cell_width], quote=False)}</span>'
+                        for start, end, color_id in zip(starts.tolist(), ends.tolist(), run_ids.tolist())))
+        f.write('\n')
+
+
+def save_result(file_path, result, theme='matrix', ansi_mode='truecolor', font_size=None, color_storage='rgb'):
+    """
+    Save a ConversionResult as HTML (.html), ANSI (.ans), an image (.png,
+    .webp), a binary container (.aag, colors stored as color_storage) or
+    plain text (.txt, .md, anything else).
+    """
+    if file_path.lower().endswith('.aag'):
+        from .container import save_container
+        save_container(file_path, result, color_storage)
+        return
+    if file_path.lower().endswith(('.png', '.webp')):
+        from .raster import DEFAULT_FONT_SIZE, save_image
+        save_image(file_path, result, theme, font_size or DEFAULT_FONT_SIZE)
+        return
+    with open(file_path, 'w', encoding='utf-8', newline='\n') as f:
+        if file_path.lower().endswith(('.html', '.htm')):
+            write_html(f, result, theme)
+        elif file_path.lower().endswith('.ans'):
+            write_ansi(f, result, ansi_mode)
+        else:
+            f.write(result.text)
@@ -0,0 +1,150 @@
+"""
+Compact, array-backed representation of generated ASCII art.
+
+An ASCIIGrid stores one glyph index per cell plus, for color ASCII, one RGB
+triple per cell. Text, rows and color runs are produced lazily from the
+arrays, so consumers never need a Python object per character.
+
+Layout (double width, spacing) works on code point arrays as well and the
+text of a whole grid is decoded in one pass.
+"""
+import numpy as np
+from PIL import Image
+
+# Glyph indices are uint16
+MAX_GLYPHS = 1 << 16
+
+
+class ASCIIGrid:
+    """
+    Glyph indices (uint16, H x W) into a character set of at most
+    MAX_GLYPHS characters, with optional RGB colors (uint8, H x W x 3).
+    Arrays that already have those types are not copied, so memory-mapped
+    grids stay mapped.
+    """
+    def __init__(self, glyphs, charset, colors=None):
+        self.charset = list(charset)
+        if len(self.charset) > MAX_GLYPHS:
+            raise ValueError(f"A character set may have at most {MAX_GLYPHS} characters, not {len(self.charset)}.")
+        self.glyphs = np.asarray(glyphs).astype(np.uint16, copy=False)
+        self.colors = None if colors is None else np.asarray(colors, dtype=np.uint8)
+        self._codepoints = None
+        self._color_ids = None
+        self._quantized = {}
+
+    @property
+    def height(self):
+        return self.glyphs.shape[0]
+
+    @property
+    def width(self):
+        return self.glyphs.shape[1]
+
+    @property
+    def codepoints(self):
+        """The character set as a uint32 code point array."""
+        if self._codepoints is None:
+            self._codepoints = np.array([ord(c) for c in self.charset], dtype='<u4')
+        return self._codepoints
+
+    def row_text(self, y, double_width=False, add_spacing=False):
+        """
+        Return row y as a string. With double_width each cell is repeated and
+        with add_spacing each cell is followed by a space, as in the color view.
+        """
+        codes = layout_codes(self.codepoints[self.glyphs[y:y + 1]], double_width, add_spacing)
+        return codes.tobytes().decode('utf-32-le')
+
+    def row_texts(self, double_width=False, add_spacing=False):
+        """Every row as a string, laid out like row_text() and decoded at once."""
+        if not self.height:
+            return []
+        return codes_text(layout_codes(self.codepoints[self.glyphs], double_width, add_spacing)).split('\n')
+
+    def rows(self):
+        """Yield every row as a string."""
+        yield from self.row_texts()
+
+    @property
+    def text(self):
+        """All rows joined with newlines."""
+        return codes_text(self.codepoints[self.glyphs])
+
+    def color_ids(self):
+        """
+        Return (ids, palette): a per-cell index into the unique colors and
+        the unique colors themselves as a (K, 3) uint8 array.
+        """
+        if self.colors is None:
+            raise ValueError("This ASCII art has no color data.")
+        if self._color_ids is None:
+            packed = (self.colors[..., 0].astype(np.uint32) << 16) | (self.colors[..., 1].astype(np.uint32) << 8) | self.colors[..., 2]
+            unique, ids = np.unique(packed, return_inverse=True)
+            palette = np.stack([(unique >> 16) & 0xFF, (unique >> 8) & 0xFF, unique & 0xFF], axis=1).astype(np.uint8)
+            self._color_ids = (ids.reshape(self.glyphs.shape), palette)
+        return self._color_ids
+
+    def quantized_ids(self, palette_size):
+        """
+        Like color_ids(), but with the colors reduced to at most palette_size
+        entries (median cut). A palette_size of 0 keeps the exact colors.
+        """
+        if not palette_size:
+            return self.color_ids()
+        if self.colors is None:
+            raise ValueError("This ASCII art has no color data.")
+        palette_size = min(int(palette_size), 256)
+        if palette_size not in self._quantized:
+            quantized = Image.fromarray(self.colors, 'RGB').quantize(colors=palette_size, method=Image.Quantize.MEDIANCUT)
+            palette = np.array(quantized.getpalette()[:palette_size * 3], dtype=np.uint8).reshape(-1, 3)
+            self._quantized[palette_size] = (np.asarray(quantized), palette)
+        return self._quantized[palette_size]
+
+
+def layout_codes(codes, double_width=False, add_spacing=False, separator=' ', between_columns=False):
+    """
+    Lay out an (H, W) array of code points. With double_width every column
+    is repeated. With add_spacing the separator follows every cell (as in
+    the color views) or, with between_columns, goes between every two
+    output columns like str.join (as in plain text).
+    """
+    if double_width:
+        codes = np.repeat(codes, 2, axis=1)
+    if add_spacing:
+        height, width = codes.shape
+        if between_columns:
+            spaced = np.full((height, max(0, 2 * width - 1)), ord(separator), dtype='<u4')
+            spaced[:, ::2] = codes
+        else:
+            cells = codes.reshape(height, -1, 2 if double_width else 1)
+            spaced = np.full(cells.shape[:2] + (cells.shape[2] + 1,), ord(separator), dtype='<u4')
+            spaced[:, :, :-1] = cells
+            spaced = spaced.reshape(height, -1)
+        codes = spaced
+    return np.ascontiguousarray(codes, dtype='<u4')
+
+
+def codes_text(codes):
+    """Decode an (H, W) code point array as rows joined with newlines."""
+    newline = np.full((codes.shape[0], 1), ord('\n'), dtype='<u4')
+    return np.hstack([codes, newline]).tobytes().decode('utf-32-le')[:-1]
+
+
+def color_runs(row_ids):
+    """
+    Split one row of color ids into runs of equal color.
+
+    Returns (starts, ends, ids) arrays; cells starts[i]:ends[i] share ids[i].
+    """
+    row_ids = np.asarray(row_ids)
+    if row_ids.size == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty, row_ids
+    starts = np.concatenate(([0], np.flatnonzero(row_ids[1:] != row_ids[:-1]) + 1))
+    ends = np.append(starts[1:], row_ids.size)
+    return starts, ends, row_ids[starts]
+
+
+def hex_color(rgb):
+    """Format an RGB triple as #rrggbb."""
+    return f"#{int(rgb[0]):02x}{int(rgb[1]):02x}{int(rgb[2]):02x}"
@@ -1,20 +1,19 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext, ttk
-from PIL import Image, ImageEnhance, ImageFilter, ImageTk, ImageOps
-import numpy as np
+from tkinter import filedialog, messagebox, ttk
+from PIL import Image, ImageTk, ImageOps
 import threading
+import time
 import os
 
-# --- ASCII Character Sets ---
-# Using dictionaries for easier access and potential expansion
-ASCII_SETS = {
-    "Detailed": list("█▉▊▋▌▍▎▏ "),
-    "Classic": list("@%#*+=-:. "),
-    "Blocks": list("██▓▒░ "),
-    "Lines": list("≡+=:-. "),
-    "Dots": list("●◐◑◒◓○⚬⚪ "),
-    "Braille": list("⣿⣾⣽⣻⣟⣯⣷⣶⣴⣲⣱⣰⣠⣀ "),
-}
+from .cache import StageCache
+from .engine import CancelToken, ConversionCancelled, ConversionEngine
+from .export import save_result
+from .viewer import ASCIIViewer
+from .profiling import StageProfiler
+from .settings import ASCII_SETS, HTML_THEMES, SETTING_CHOICES, SETTING_RANGES
+
+# Delay after the last setting change before Live Preview regenerates
+LIVE_DEBOUNCE_MS = 250
 
 class ToolTip:
     """
@@ -58,17 +57,29 @@ class ASCIIArtGeneratorApp:
 
         # --- Instance Variables ---
         self.ascii_art_data = ""
-        self.original_image = None
+        self.result = None # Last ConversionResult, used for export
+        self.original_image = None # Preview-sized copy of the selected image
         self.processed_image_for_preview = None
         self.is_processing = False
         self.file_path = None
         self.canvas = None # To hold the scrollable canvas
+        self.display_stats = "" # Palette/row counts from the last color display
+        self.generation = 0 # Incremented per request; only the newest result is drawn
+        self.cancel_token = None # Token of the newest running conversion
+        self.live_job = None # Pending debounced Live Preview update
+        self.last_change_time = 0.0
+        self.engine = ConversionEngine(cache=StageCache()) # Reuses unchanged stages between regenerations
 
         self._setup_styles()
         self._create_variables()
         self._create_widgets()
         self._display_welcome_message()
 
+        # Live Preview: every setting change schedules a debounced regeneration
+        for var in vars(self).values():
+            if isinstance(var, tk.Variable) and var not in (self.live_var, self.theme_var, self.profile_var):
+                var.trace_add('write', self._on_setting_changed)
+
     def _setup_styles(self):
         """Configure styles for ttk widgets."""
         style = ttk.Style()
@@ -89,12 +100,18 @@ class ASCIIArtGeneratorApp:
         self.sharpness_var = tk.DoubleVar(value=1.0)
         self.saturation_var = tk.DoubleVar(value=1.0)
         self.remove_bg_var = tk.BooleanVar(value=False)
+        self.bg_mode_var = tk.StringVar(value="color")
         self.bg_threshold_var = tk.IntVar(value=240)
         self.bg_feather_var = tk.IntVar(value=5)
         self.effects_var = tk.StringVar(value='enhance')
         self.char_set_var = tk.StringVar(value='Detailed')
+        self.mapping_mode_var = tk.StringVar(value='brightness')
         self.adaptive_var = tk.BooleanVar(value=True)
+        self.equalization_var = tk.StringVar(value='global')
+        self.clahe_tiles_var = tk.IntVar(value=8)
+        self.clahe_clip_var = tk.DoubleVar(value=2.0)
         self.dithering_var = tk.BooleanVar(value=False)
+        self.dither_algorithm_var = tk.StringVar(value='floyd-steinberg')
         self.detail_var = tk.BooleanVar(value=True)
         self.aspect_var = tk.BooleanVar(value=True)
         self.color_mode_var = tk.StringVar(value='weighted')
@@ -107,6 +124,13 @@ class ASCIIArtGeneratorApp:
         self.border_char_var = tk.StringVar(value='█')
         self.theme_var = tk.StringVar(value='matrix')
         self.color_ascii_var = tk.BooleanVar(value=False)
+        self.palette_size_var = tk.IntVar(value=64)
+        self.decode_oversample_var = tk.IntVar(value=0)
+        self.pipeline_order_var = tk.StringVar(value="quality")
+        self.tiled_var = tk.BooleanVar(value=False)
+        self.memory_budget_var = tk.IntVar(value=256)
+        self.live_var = tk.BooleanVar(value=False)
+        self.profile_var = tk.BooleanVar(value=False)
 
     def _create_widgets(self):
         """Create and layout all the widgets for the application."""
@@ -179,10 +203,14 @@ class ASCIIArtGeneratorApp:
         output_frame = tk.Frame(content_frame, bg='#ffffff')
         output_frame.pack(fill='both', expand=True, padx=15, pady=15)
 
-        tk.Label(output_frame, text="🎨 ASCII ART OUTPUT", font=('Segoe UI', 14, 'bold'), bg='#ffffff', fg='#2c3e50').pack(anchor='w', pady=(0, 10))
-
-        self.text_area = scrolledtext.ScrolledText(output_frame, wrap=tk.NONE, font=('Consolas', 9), bg='#1e1e1e', fg='#00ff00', insertbackground='white', selectbackground='#3498db', relief='flat', bd=0)
-        self.text_area.pack(fill='both', expand=True)
+        output_header = tk.Frame(output_frame, bg='#ffffff')
+        output_header.pack(fill='x', pady=(0, 10))
+        tk.Label(output_header, text="🎨 ASCII ART OUTPUT", font=('Segoe UI', 14, 'bold'), bg='#ffffff', fg='#2c3e50').pack(side='left')
+        # Only the visible rows are drawn, so huge results scroll and zoom smoothly
+        self.viewer = ASCIIViewer(output_frame, family='Consolas', size=9, bg='#1e1e1e', fg='#00ff00')
+        self.viewer.pack(fill='both', expand=True)
+        for text, steps in (("🔍+", 1), ("🔍−", -1)):
+            tk.Button(output_header, text=text, command=lambda s=steps: self.viewer.zoom(s), relief='flat', bg='#3498db', fg='white', font=('Segoe UI', 9, 'bold')).pack(side='right', padx=2)
 
         # --- Status Bar ---
         self.status_label = tk.Label(status_frame, text="🚀 Ready to create!", font=('Segoe UI', 10), bg='#34495e', fg='#ecf0f1')
@@ -223,25 +251,35 @@ class ASCIIArtGeneratorApp:
         notebook.add(tab_actions, text='Actions')
 
         # --- Basic Settings Tab ---
-        self._create_control(tab_basic, "Width:", self.width_var, 50, 500, 'scale', "Width of the generated ASCII art in characters.")
+        self._create_control(tab_basic, "Width:", self.width_var, *SETTING_RANGES['width'], 'scale', "Width of the generated ASCII art in characters.")
         self._create_control(tab_basic, "Character Set:", self.char_set_var, list(ASCII_SETS.keys()), None, 'combo', "The set of characters used to render the image.")
+        self._create_control(tab_basic, "Mapping Mode:", self.mapping_mode_var, SETTING_CHOICES['mapping_mode'], None, 'combo', "brightness: pick characters by gray level. structure: pick the character whose shape best matches each cell, keeping edges and lines. braille: 2x4 dots per character (ignores the character set).")
         self._create_control(tab_basic, "Effects:", self.effects_var, ['none', 'enhance', 'smooth', 'edge', 'artistic', 'dramatic'], None, 'combo', "Apply a pre-processing effect to the image.")
         self._create_control(tab_basic, "🌈 Generate Color ASCII", self.color_ascii_var, None, None, 'check', "Generate ASCII art using the original image colors.")
         
         # --- Enhancement Tab ---
-        self._create_control(tab_enhance, "Brightness:", self.brightness_var, 0.1, 3.0, 'scale', "Adjust image brightness.")
-        self._create_control(tab_enhance, "Contrast:", self.contrast_var, 0.1, 3.0, 'scale', "Adjust image contrast.")
-        self._create_control(tab_enhance, "Sharpness:", self.sharpness_var, 0.1, 3.0, 'scale', "Adjust image sharpness.")
-        self._create_control(tab_enhance, "Saturation:", self.saturation_var, 0.1, 3.0, 'scale', "Adjust color saturation (for color ASCII).")
+        self._create_control(tab_enhance, "Brightness:", self.brightness_var, *SETTING_RANGES['brightness'], 'scale', "Adjust image brightness.")
+        self._create_control(tab_enhance, "Contrast:", self.contrast_var, *SETTING_RANGES['contrast'], 'scale', "Adjust image contrast.")
+        self._create_control(tab_enhance, "Sharpness:", self.sharpness_var, *SETTING_RANGES['sharpness'], 'scale', "Adjust image sharpness.")
+        self._create_control(tab_enhance, "Saturation:", self.saturation_var, *SETTING_RANGES['saturation'], 'scale', "Adjust color saturation (for color ASCII).")
 
         # --- Advanced Tab ---
         self._create_control(tab_advanced, "Remove Background", self.remove_bg_var, None, None, 'check', "Intelligently remove the image background.")
-        self._create_control(tab_advanced, "BG Threshold:", self.bg_threshold_var, 1, 255, 'scale', "Sensitivity for background detection.")
-        self._create_control(tab_advanced, "BG Feather:", self.bg_feather_var, 0, 20, 'scale', "Smooth the edges of the background removal.")
+        self._create_control(tab_advanced, "BG Mode:", self.bg_mode_var, SETTING_CHOICES['bg_mode'], None, 'combo', "'color' removes every pixel close to the corner color; 'connected' only removes background regions touching the border.")
+        self._create_control(tab_advanced, "BG Threshold:", self.bg_threshold_var, *SETTING_RANGES['bg_threshold'], 'scale', "Sensitivity for background detection.")
+        self._create_control(tab_advanced, "BG Feather:", self.bg_feather_var, *SETTING_RANGES['bg_feather'], 'scale', "Smooth the edges of the background removal.")
         self._create_control(tab_advanced, "Adaptive Mapping", self.adaptive_var, None, None, 'check', "Use histogram equalization for better contrast.")
+        self._create_control(tab_advanced, "Equalization:", self.equalization_var, SETTING_CHOICES['equalization'], None, 'combo', "global: one histogram for the whole image. clahe: contrast-limited equalization per tile, keeps local detail in dark and bright areas.")
+        self._create_control(tab_advanced, "CLAHE Tiles:", self.clahe_tiles_var, SETTING_CHOICES['clahe_tiles'], None, 'combo', "Number of tiles along each axis for CLAHE.")
+        self._create_control(tab_advanced, "CLAHE Clip Limit:", self.clahe_clip_var, *SETTING_RANGES['clahe_clip'], 'scale', "How much CLAHE may boost contrast; higher values bring out more local detail (and noise).")
         self._create_control(tab_advanced, "Dithering", self.dithering_var, None, None, 'check', "Simulate more shades of gray for smoother gradients.")
+        self._create_control(tab_advanced, "Dither Algorithm:", self.dither_algorithm_var, SETTING_CHOICES['dither_algorithm'], None, 'combo', "Error diffusion (Floyd-Steinberg, Atkinson) or ordered (Bayer) dithering.")
         self._create_control(tab_advanced, "Preserve Detail", self.detail_var, None, None, 'check', "Apply sharpening before resizing to keep details.")
         self._create_control(tab_advanced, "Aspect Correction", self.aspect_var, None, None, 'check', "Correct for non-square character aspect ratio.")
+        self._create_control(tab_advanced, "Decode Oversample:", self.decode_oversample_var, SETTING_CHOICES['decode_oversample'], None, 'combo', "Decode large images at reduced size, at least this many times the output width (0 = full resolution).")
+        self._create_control(tab_advanced, "Pipeline Order:", self.pipeline_order_var, SETTING_CHOICES['pipeline_order'], None, 'combo', "'fast' shrinks the image before background removal, effects and enhancements.")
+        self._create_control(tab_advanced, "Tiled Processing", self.tiled_var, None, None, 'check', "Read very large uncompressed images (BMP, PPM, TIFF) in bands of rows so memory stays within the budget.")
+        self._create_control(tab_advanced, "Memory Budget (MB):", self.memory_budget_var, SETTING_CHOICES['memory_budget_mb'], None, 'combo', "Memory used per band in tiled processing.")
         self._create_control(tab_advanced, "Smart Background", self.smart_bg_var, None, None, 'check', "Choose a contrasting background for transparent images.")
 
         # --- Style Tab ---
@@ -252,13 +290,18 @@ class ASCIIArtGeneratorApp:
         self._create_control(tab_style, "Reverse Colors", self.reverse_var, None, None, 'check', "Invert the character brightness (light becomes dark).")
         self._create_control(tab_style, "Add Border", self.border_var, None, None, 'check', "Add a border around the ASCII art.")
         self._create_control(tab_style, "Border Char:", self.border_char_var, ['█', '▓', '▒', '░', '#', '*', '+', '-'], None, 'combo', "Character to use for the border.")
-        self.html_theme_control = self._create_control(tab_style, "HTML Theme:", self.theme_var, ['matrix', 'terminal', 'retro', 'paper'], None, 'combo', "Theme for HTML export.")
+        self._create_control(tab_style, "Display Palette:", self.palette_size_var, SETTING_CHOICES['palette_size'], None, 'combo', "Number of colors used to show color ASCII (0 = exact colors). Fewer colors draw faster.")
+        self.html_theme_control = self._create_control(tab_style, "HTML Theme:", self.theme_var, list(HTML_THEMES.keys()), None, 'combo', "Theme for HTML export.")
 
         # --- Actions Tab ---
+        self._create_control(tab_actions, "⚡ Live Preview", self.live_var, None, None, 'check', "Regenerate automatically shortly after any setting changes.")
         tk.Button(tab_actions, text="🔄 Regenerate ASCII", command=self.process_with_progress, relief='flat', bg='#e74c3c', fg='white', font=('Segoe UI', 10, 'bold')).pack(pady=5, fill='x', padx=15)
         tk.Button(tab_actions, text="💾 Save to File", command=self.save_ascii, relief='flat', bg='#27ae60', fg='white', font=('Segoe UI', 10, 'bold')).pack(pady=5, fill='x', padx=15)
         self.copy_btn = tk.Button(tab_actions, text="📋 Copy to Clipboard", command=self.copy_to_clipboard, relief='flat', bg='#f39c12', fg='white', font=('Segoe UI', 10, 'bold'))
         self.copy_btn.pack(pady=5, fill='x', padx=15)
+        self._create_control(tab_actions, "📈 Profile Stages", self.profile_var, None, None, 'check', "Measure time, CPU and peak memory of every pipeline stage.")
+        tk.Button(tab_actions, text="📈 Show Profile", command=self.show_profile, relief='flat', bg='#8e44ad', fg='white', font=('Segoe UI', 10, 'bold')).pack(pady=5, fill='x', padx=15)
+        tk.Button(tab_actions, text="📈 Save Profile", command=self.save_profile, relief='flat', bg='#8e44ad', fg='white', font=('Segoe UI', 10, 'bold')).pack(pady=5, fill='x', padx=15)
         tk.Button(tab_actions, text="🔄 Reset Settings", command=self.reset_settings, relief='flat', bg='#95a5a6', fg='white', font=('Segoe UI', 10, 'bold')).pack(pady=5, fill='x', padx=15)
 
     def _create_control(self, parent, label, var, val1, val2, ctype, tooltip_text):
@@ -293,12 +336,18 @@ class ASCIIArtGeneratorApp:
             'sharpness': self.sharpness_var.get(),
             'saturation': self.saturation_var.get(),
             'remove_bg': self.remove_bg_var.get(),
+            'bg_mode': self.bg_mode_var.get(),
             'bg_threshold': self.bg_threshold_var.get(),
             'bg_feather': self.bg_feather_var.get(),
             'effects': self.effects_var.get(),
             'char_set': self.char_set_var.get(),
+            'mapping_mode': self.mapping_mode_var.get(),
             'adaptive': self.adaptive_var.get(),
+            'equalization': self.equalization_var.get(),
+            'clahe_tiles': self.clahe_tiles_var.get(),
+            'clahe_clip': self.clahe_clip_var.get(),
             'dithering': self.dithering_var.get(),
+            'dither_algorithm': self.dither_algorithm_var.get(),
             'preserve_detail': self.detail_var.get(),
             'aspect_correction': self.aspect_var.get(),
             'color_mode': self.color_mode_var.get(),
@@ -310,6 +359,11 @@ class ASCIIArtGeneratorApp:
             'add_border': self.border_var.get(),
             'border_char': self.border_char_var.get(),
             'color_ascii': self.color_ascii_var.get(),
+            'palette_size': self.palette_size_var.get(),
+            'decode_oversample': self.decode_oversample_var.get(),
+            'pipeline_order': self.pipeline_order_var.get(),
+            'tiled_processing': self.tiled_var.get(),
+            'memory_budget_mb': self.memory_budget_var.get(),
         }
 
     def open_file(self):
@@ -323,12 +377,16 @@ class ASCIIArtGeneratorApp:
 
         self.file_path = file_path
         try:
-            self.original_image = Image.open(file_path)
+            with Image.open(file_path) as image:
+                width, height = image.size
+                mode = image.mode
+                # Only a preview-sized copy is kept; thumbnail() lets JPEGs
+                # decode at reduced size
+                image.thumbnail((340, 240), Image.Resampling.LANCZOS)
+                self.original_image = image
             filename = os.path.basename(file_path)
             self.file_label.config(text=f"{filename}")
             
-            width, height = self.original_image.size
-            mode = self.original_image.mode
             self.info_label.config(text=f"📐 {width}×{height} pixels, {mode} mode")
             
             self.update_preview(self.original_image)
@@ -351,344 +409,176 @@ class ASCIIArtGeneratorApp:
         self.processed_image_for_preview = ImageTk.PhotoImage(preview_with_border)
         self.preview_label.config(image=self.processed_image_for_preview, text="")
 
-    def process_with_progress(self):
-        """Process the image in a separate thread with a progress bar."""
+    def process_with_progress(self, requested_at=None):
+        """
+        Process the image in a separate thread with a progress bar.
+
+        The newest request always wins: a conversion that is still running is
+        cancelled at its next stage boundary and its result is never drawn.
+        """
         if not self.file_path:
             messagebox.showwarning("Warning", "Please select an image file first.")
             return
-        if self.is_processing:
-            return
 
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        self.generation += 1
+        self.cancel_token = CancelToken()
         self.is_processing = True
         self.progress_bar.start(10)
-        
-        thread = threading.Thread(target=self._processing_thread, daemon=True)
+        self.status_label.config(text="🔄 Processing image...")
+
+        # Settings are read here, on the Tk thread
+        profiler = StageProfiler() if self.profile_var.get() else None
+        args = (self.generation, self._get_current_settings(), self.cancel_token, requested_at or time.perf_counter(), profiler)
+        thread = threading.Thread(target=self._processing_thread, args=args, daemon=True)
         thread.start()
 
-    def _processing_thread(self):
-        """The actual image processing logic that runs in a background thread."""
-        self.root.after(0, self.status_label.config, {'text': "🔄 Processing image..."})
-        
-        settings = self._get_current_settings()
-        
-        try:
-            # --- Image Processing Pipeline ---
-            image = Image.open(self.file_path)
-            
-            # Ensure image is in a workable mode (RGBA for transparency handling)
-            if image.mode != 'RGBA':
-                image = image.convert('RGBA')
-
-            # 1. Background Removal
-            if settings['remove_bg']:
-                image = self._intelligent_background_removal(image, settings['bg_threshold'], settings['bg_feather'])
-
-            # 2. Pre-processing Effects
-            if settings["effects"] != "none":
-                # Effects work on RGB, so convert, apply, then potentially convert back
-                alpha = image.split()[-1]
-                rgb_image = image.convert("RGB")
-                processed_rgb = self._apply_effects(rgb_image, settings["effects"])
-                processed_rgb.putalpha(alpha)
-                image = processed_rgb
-
-            # 3. Image Enhancements (Brightness, Contrast, etc.)
-            rgb_image = image.convert("RGB") # Enhancements work on RGB
-            enhancers = {
-                'brightness': ImageEnhance.Brightness,
-                'contrast': ImageEnhance.Contrast,
-                'sharpness': ImageEnhance.Sharpness,
-                'saturation': ImageEnhance.Color,
-            }
-            for key, enhancer_class in enhancers.items():
-                if settings[key] != 1.0:
-                    enhancer = enhancer_class(rgb_image)
-                    rgb_image = enhancer.enhance(settings[key])
-            
-            alpha = image.split()[-1]
-            rgb_image.putalpha(alpha)
-            image = rgb_image
-
-            # 4. Handle transparency
-            if image.mode == 'RGBA':
-                bg_color = (255, 255, 255) # Default white
-                if settings['smart_background']:
-                    # Simple smart bg: use inverted average color of non-transparent parts
-                    non_transparent = np.array(image)[np.array(image)[:,:,3] > 128]
-                    if len(non_transparent) > 0:
-                        avg_color = np.mean(non_transparent[:, :3], axis=0)
-                        bg_color = tuple(255 - int(c) for c in avg_color)
-
-                background = Image.new('RGBA', image.size, bg_color + (255,))
-                background.paste(image, mask=image)
-                image = background.convert('RGB')
-            else:
-                image = image.convert('RGB')
+    def _on_setting_changed(self, *args):
+        """Schedule a debounced regeneration when Live Preview is on."""
+        if not self.live_var.get() or not self.file_path:
+            return
+        self.last_change_time = time.perf_counter()
+        if self.live_job is not None:
+            self.root.after_cancel(self.live_job)
+        self.live_job = self.root.after(LIVE_DEBOUNCE_MS, self._run_live_update)
 
-            # 5. Resize
-            resized_image = self._intelligent_resize(image, settings['width'], settings['preserve_detail'], settings['aspect_correction'])
-            
-            # --- ASCII Generation ---
-            if settings['color_ascii']:
-                self.ascii_art_data, colored_data = self._create_color_ascii(resized_image, settings)
-                self.root.after(0, self._display_color_ascii, colored_data)
-            else:
-                # 6. Grayscale Conversion
-                gray_image = self._convert_to_grayscale(resized_image, settings)
-                
-                # 7. ASCII Mapping
-                ascii_str = self._map_pixels_to_ascii(gray_image, settings)
-                
-                # 8. Formatting
-                self.ascii_art_data = self._format_ascii_output(ascii_str, gray_image.width, settings)
-                self.root.after(0, self._display_mono_ascii, self.ascii_art_data)
-
-            # --- Final UI Updates ---
-            self.root.after(0, self.update_preview, image)
-            self.root.after(0, self.status_label.config, {'text': "✅ Generation successful!"})
-            lines = self.ascii_art_data.count('\n') + 1
-            chars = len(self.ascii_art_data)
-            self.root.after(0, self.stats_label.config, {'text': f"📊 {lines} lines, {chars} characters"})
+    def _run_live_update(self):
+        self.live_job = None
+        self.process_with_progress(self.last_change_time)
 
+    def _processing_thread(self, generation, settings, cancel_token, requested_at, profiler=None):
+        """The actual image processing logic that runs in a background thread."""
+        try:
+            result = self.engine.convert(self.file_path, settings, cancel=cancel_token, profiler=profiler)
+            self.root.after(0, self._show_result, generation, result, requested_at)
+        except ConversionCancelled:
+            if profiler is not None:
+                profiler.finish()
         except Exception as e:
-            self.root.after(0, messagebox.showerror, "Processing Error", f"An error occurred: {e}")
-            self.root.after(0, self.status_label.config, {'text': "❌ Error during processing."})
-        finally:
-            self.is_processing = False
-            self.root.after(0, self.progress_bar.stop)
-
-    # --- Image Processing Sub-routines ---
-
-    def _intelligent_background_removal(self, image, threshold, feather_radius):
-        """Remove background from an RGBA image."""
-        if image.mode != 'RGBA':
-            return image
-        
-        img_array = np.array(image)
-        # Use corners to guess background color
-        corners = [img_array[0, 0], img_array[0, -1], img_array[-1, 0], img_array[-1, -1]]
-        bg_color = np.mean([c for c in corners if c[3] > 0], axis=0)[:3] if any(c[3] > 0 for c in corners) else (255, 255, 255)
-        
-        distances = np.sqrt(np.sum((img_array[:, :, :3] - bg_color) ** 2, axis=2))
-        alpha_mask = np.where(distances < threshold, 0, 255).astype(np.uint8)
-
-        # Feathering using Pillow instead of Scipy
-        if feather_radius > 0:
-            mask_img = Image.fromarray(alpha_mask, 'L')
-            feathered_mask = mask_img.filter(ImageFilter.GaussianBlur(radius=feather_radius))
-            alpha_mask = np.array(feathered_mask)
-            
-        img_array[:, :, 3] = alpha_mask
-        return Image.fromarray(img_array, 'RGBA')
-
-    def _apply_effects(self, image, effect_type):
-        """Apply pre-processing visual effects."""
-        effects = {
-            "enhance": lambda img: img.filter(ImageFilter.UnsharpMask(radius=1.5, percent=200, threshold=3)),
-            "smooth": lambda img: img.filter(ImageFilter.GaussianBlur(radius=0.5)).filter(ImageFilter.EDGE_ENHANCE),
-            "edge": lambda img: ImageOps.invert(img.filter(ImageFilter.FIND_EDGES)).filter(ImageFilter.SMOOTH),
-            "artistic": lambda img: ImageOps.autocontrast(img.filter(ImageFilter.EMBOSS)),
-            "dramatic": lambda img: ImageOps.autocontrast(img, cutoff=5).filter(ImageFilter.UnsharpMask(radius=2, percent=300, threshold=5))
-        }
-        if effect_type in effects:
-            return effects[effect_type](image)
-        return image
-
-    def _intelligent_resize(self, image, target_width, preserve_detail, aspect_correction):
-        """Resize image with detail preservation and aspect ratio correction."""
-        width, height = image.size
-        aspect_ratio = height / width
-        char_aspect = 0.55 if aspect_correction else 1.0
-        new_height = int(target_width * aspect_ratio * char_aspect)
-        
-        if preserve_detail and target_width < width:
-            image = image.filter(ImageFilter.UnsharpMask(radius=0.5, percent=100, threshold=1))
-            
-        return image.resize((target_width, new_height), Image.Resampling.LANCZOS)
-
-    def _convert_to_grayscale(self, image, settings):
-        """Convert an RGB image to grayscale using the selected method."""
-        mode = settings['color_mode']
-        if mode == 'weighted':
-            # This is the standard, perceptually-weighted conversion
-            return image.convert('L')
-        elif mode == 'desaturate':
-            return ImageOps.grayscale(image)
-        elif mode == 'channel':
-            r, g, b = image.split()
-            channel_map = {'red': r, 'green': g, 'blue': b}
-            return channel_map.get(settings['color_channel'], r)
-        return image.convert('L') # Default fallback
-
-    def _map_pixels_to_ascii(self, image, settings):
-        """Map grayscale pixel values to ASCII characters."""
-        pixels = np.array(image.getdata())
-        char_set = ASCII_SETS[settings['char_set']]
-        
-        if settings['adaptive']:
-            # Histogram equalization for better contrast
-            hist, bins = np.histogram(pixels, bins=256, range=(0, 255))
-            cdf = hist.cumsum()
-            cdf_normalized = cdf / cdf[-1]
-            equalized_pixels = np.interp(pixels, bins[:-1], cdf_normalized * 255)
-            pixels = equalized_pixels
-
-        # Map pixels to characters
-        indices = (pixels * (len(char_set) / 256)).astype(int)
-        indices = np.clip(indices, 0, len(char_set) - 1)
-        ascii_chars = [char_set[i] for i in indices]
-        
-        return "".join(ascii_chars)
+            if profiler is not None:
+                profiler.finish()
+            self.root.after(0, self._show_error, generation, e)
+
+    def _show_result(self, generation, result, requested_at):
+        """Draw a finished conversion unless a newer one was requested meanwhile."""
+        if generation != self.generation:
+            if result.profile is not None:
+                result.profile.finish()
+            return
+        self.result = result
+        self.ascii_art_data = result.text
 
-    def _create_color_ascii(self, image, settings):
-        """Generate ASCII art with color data."""
-        pixels = np.array(image)
-        gray_image = self._convert_to_grayscale(image, settings)
-        ascii_str = self._map_pixels_to_ascii(gray_image, settings)
-        
-        img_width = image.width
-        
-        # Create a list of (char, color_tuple)
-        colored_data = []
-        for i, char in enumerate(ascii_str):
-            y, x = divmod(i, img_width)
-            color = tuple(pixels[y, x])
-            colored_data.append((char, color))
-            
-        # Format for plain text copy/paste
-        plain_text = self._format_ascii_output(ascii_str, img_width, settings)
-        return plain_text, colored_data
+        if result.profile is None:
+            self._display_ascii(result)
+        else:
+            with result.profile.stage('display'):
+                self._display_ascii(result)
+            result.profile.finish()
+
+        # --- Final UI Updates ---
+        self.update_preview(result.image)
+        latency_ms = (time.perf_counter() - requested_at) * 1000
+        cache_info = f"♻️ {result.cache_hits} cached / {result.cache_misses} computed stages"
+        self.status_label.config(text=f"✅ Generation successful! {cache_info} | ⚡ {latency_ms:.0f} ms")
+        self._update_stats(result)
+        self.is_processing = False
+        self.progress_bar.stop()
 
-    def _format_ascii_output(self, ascii_str, width, settings):
-        """Apply final formatting like borders, spacing, etc."""
-        lines = [ascii_str[i:i + width] for i in range(0, len(ascii_str), width)]
-        
-        formatted_lines = []
-        for line in lines:
-            if settings['double_width']:
-                line = ''.join(c * 2 for c in line)
-            if settings['add_spacing']:
-                line = ' '.join(line)
-            if settings['reverse_colors']:
-                char_set = ASCII_SETS[settings['char_set']]
-                reversed_set = char_set[::-1]
-                line = ''.join(reversed_set[char_set.index(c)] if c in char_set else c for c in line)
-            formatted_lines.append(line)
-            
-        if settings['add_border']:
-            border_char = settings['border_char']
-            max_len = max(len(line) for line in formatted_lines) if formatted_lines else 0
-            border_line = border_char * (max_len + 4)
-            formatted_lines = [border_line] + [f"{border_char} {line.ljust(max_len)} {border_char}" for line in formatted_lines] + [border_line]
-            
-        return '\n'.join(formatted_lines)
+    def _show_error(self, generation, error):
+        """Report a failed conversion if it is still the newest one."""
+        if generation != self.generation:
+            return
+        self.is_processing = False
+        self.progress_bar.stop()
+        messagebox.showerror("Processing Error", f"An error occurred: {error}")
+        self.status_label.config(text="❌ Error during processing.")
 
-    # --- UI Display and Actions ---
+    def _display_ascii(self, result):
+        if result.settings['color_ascii']:
+            self._display_color_ascii(result)
+        else:
+            self._display_mono_ascii(result.text)
 
     def _display_mono_ascii(self, ascii_data):
-        """Display monochrome ASCII art in the text area."""
-        self.text_area.config(fg='#00ff00') # Reset to default green
-        self.text_area.delete(1.0, tk.END)
-        self.text_area.insert(tk.END, ascii_data)
-
-    def _display_color_ascii(self, colored_data):
-        """Display colored ASCII art using Tkinter tags."""
-        self.text_area.delete(1.0, tk.END)
-        
-        # Configure a tag for each unique color
-        color_tags = {}
-        for char, color in colored_data:
-            hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-            if hex_color not in color_tags:
-                tag_name = f"color_{hex_color.strip('#')}"
-                self.text_area.tag_configure(tag_name, foreground=hex_color)
-                color_tags[hex_color] = tag_name
-        
-        # Insert characters with their color tags
-        width = self.width_var.get()
-        settings = self._get_current_settings()
-        
-        for i, (char, color) in enumerate(colored_data):
-            hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-            tag_name = color_tags[hex_color]
-            
-            # Handle formatting
-            display_char = char
-            if settings['double_width']:
-                display_char *= 2
-            if settings['add_spacing']:
-                display_char += ' '
-            
-            self.text_area.insert(tk.END, display_char, (tag_name,))
-            if (i + 1) % width == 0:
-                self.text_area.insert(tk.END, '\n')
+        """Display monochrome ASCII art in the viewer."""
+        self.viewer.show_text(ascii_data, '#00ff00') # Reset to default green
+
+    def _display_color_ascii(self, result):
+        """
+        Display colored ASCII art in the viewer.
+
+        Colors are reduced to the selected palette size; the viewer draws
+        one item per run of the same color, for the visible rows only.
+        Ctrl+C copies the same formatted text as the Copy button.
+        """
+        color_art, settings = result.color_art, result.settings
+        ids, palette = color_art.quantized_ids(settings['palette_size'])
+        self.viewer.show_color(color_art, ids, palette, settings['double_width'], settings['add_spacing'], result.text)
+        self.display_stats = f"🎨 {len(palette)} colors, {color_art.height} rows (drawn on demand)"
+
+    def _update_stats(self, result):
+        """Show line/character counts and, for color output, display costs."""
+        stats = f"📊 {result.lines} lines, {result.chars} characters"
+        if result.settings.get('color_ascii') and self.display_stats:
+            stats += f" | {self.display_stats}"
+        if result.profile is not None:
+            stats += f" | ⏱ {result.profile.summary()}"
+        self.stats_label.config(text=stats)
 
     def save_ascii(self):
-        """Save the generated ASCII art to a file (TXT, HTML, MD)."""
-        if not self.ascii_art_data:
+        """Save the generated ASCII art to a file (TXT, HTML, MD, ANS, PNG, WebP)."""
+        if not self.ascii_art_data or self.result is None:
             messagebox.showwarning("Warning", "Please generate ASCII art first.")
             return
 
         file_path = filedialog.asksaveasfilename(
             title="Save Super Realistic ASCII Art",
             defaultextension=".txt",
-            filetypes=[("Text Files", "*.txt"), ("HTML Files", "*.html"), ("Markdown Files", "*.md")]
+            filetypes=[("Text Files", "*.txt"), ("HTML Files", "*.html"), ("Markdown Files", "*.md"), ("ANSI Files", "*.ans"), ("PNG Image", "*.png"), ("WebP Image", "*.webp"), ("ASCII Art Container", "*.aag")]
         )
         if not file_path:
             return
 
         try:
-            if file_path.endswith('.html'):
-                # Enhanced HTML export that supports color
-                theme_name = self.theme_var.get()
-                themes = {
-                    'matrix': {'bg': '#000000', 'color': '#00ff00', 'font': 'Courier New'},
-                    'terminal': {'bg': '#1e1e1e', 'color': '#ffffff', 'font': 'Consolas'},
-                    'retro': {'bg': '#000080', 'color': '#ffff00', 'font': 'monospace'},
-                    'paper': {'bg': '#f5f5f5', 'color': '#000000', 'font': 'Courier New'}
-                }
-                theme = themes.get(theme_name, themes['matrix'])
-                
-                # Build HTML content
-                if self.color_ascii_var.get():
-                    # Create colored spans
-                    body_content = ""
-                    width = self.width_var.get()
-                    # Re-run a lightweight color generation for export
-                    settings = self._get_current_settings()
-                    resized_image = self._intelligent_resize(self.original_image.convert('RGB'), settings['width'], settings['preserve_detail'], settings['aspect_correction'])
-                    _, colored_data = self._create_color_ascii(resized_image, settings)
-                    
-                    for i, (char, color) in enumerate(colored_data):
-                        hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-                        body_content += f'<span style="color:{hex_color};">{char.replace(" ", "&nbsp;")}</span>'
-                        if (i + 1) % width == 0:
-                            body_content += '<br>'
-                else:
-                    # Plain text in a <pre> tag
-                    body_content = f'<pre>{self.ascii_art_data}</pre>'
-
-                html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>ASCII Art</title>
-    <style>
-        body {{ background: {theme['bg']}; color: {theme['color']}; font-family: '{theme['font']}', monospace; white-space: pre; line-height: 1; font-size: 10px; }}
-    </style>
-</head>
-<body>{body_content}</body>
-</html>"""
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-            else: # For TXT and MD
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(self.ascii_art_data)
-            
+            # HTML is streamed from the result that is on screen, including
+            # all effects, enhancements and background removal
+            save_result(file_path, self.result, self.theme_var.get())
             messagebox.showinfo("Success", f"ASCII art saved to {file_path}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save file: {e}")
 
+    def show_profile(self):
+        """Show the per-stage breakdown of the last profiled conversion."""
+        if self.result is None or self.result.profile is None:
+            messagebox.showwarning("Warning", "Enable 📈 Profile Stages and generate ASCII art first.")
+            return
+        messagebox.showinfo("Stage Profile", self.result.profile.format_breakdown())
+
+    def save_profile(self):
+        """Save the last profile as a Chrome trace (.json) or append it to a JSON lines log (.jsonl)."""
+        if self.result is None or self.result.profile is None:
+            messagebox.showwarning("Warning", "Enable 📈 Profile Stages and generate ASCII art first.")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            title="Save Stage Profile",
+            defaultextension=".json",
+            filetypes=[("Chrome Trace", "*.json"), ("JSON Lines Log", "*.jsonl")]
+        )
+        if not file_path:
+            return
+
+        try:
+            if file_path.lower().endswith('.jsonl'):
+                self.result.profile.append_log(file_path, source=self.file_path, settings=self.result.settings,
+                                               seconds=self.result.elapsed, cache_hits=self.result.cache_hits)
+            else:
+                self.result.profile.write_chrome_trace(file_path)
+            messagebox.showinfo("Success", f"Profile saved to {file_path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save profile: {e}")
+
     def copy_to_clipboard(self):
         """Copy the ASCII art plain text to the clipboard."""
         if self.ascii_art_data:
@@ -709,12 +599,18 @@ class ASCIIArtGeneratorApp:
         self.sharpness_var.set(1.0)
         self.saturation_var.set(1.0)
         self.remove_bg_var.set(False)
+        self.bg_mode_var.set("color")
         self.bg_threshold_var.set(240)
         self.bg_feather_var.set(5)
         self.effects_var.set('enhance')
         self.char_set_var.set('Detailed')
+        self.mapping_mode_var.set('brightness')
         self.adaptive_var.set(True)
+        self.equalization_var.set('global')
+        self.clahe_tiles_var.set(8)
+        self.clahe_clip_var.set(2.0)
         self.dithering_var.set(False)
+        self.dither_algorithm_var.set('floyd-steinberg')
         self.detail_var.set(True)
         self.aspect_var.set(True)
         self.color_mode_var.set('weighted')
@@ -727,6 +623,12 @@ class ASCIIArtGeneratorApp:
         self.border_char_var.set('█')
         self.theme_var.set('matrix')
         self.color_ascii_var.set(False)
+        self.palette_size_var.set(64)
+        self.decode_oversample_var.set(0)
+        self.pipeline_order_var.set("quality")
+        self.tiled_var.set(False)
+        self.memory_budget_var.set(256)
+        self.profile_var.set(False)
         self.status_label.config(text="🔄 Settings reset to defaults.")
 
     def _display_welcome_message(self):
@@ -747,9 +649,13 @@ class ASCIIArtGeneratorApp:
 4. Click "🔄 Regenerate ASCII" in the Actions tab.
 5. Save or copy your masterpiece!
 """
-        self.text_area.insert(tk.END, welcome_message)
+        self.viewer.show_text(welcome_message)
 
-if __name__ == "__main__":
+def main():
+    """Launch the desktop application."""
     root = tk.Tk()
     app = ASCIIArtGeneratorApp(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
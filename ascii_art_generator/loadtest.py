@@ -0,0 +1,83 @@
+"""
+Load test for the HTTP conversion service.
+
+    python -m ascii_art_generator serve --workers 4 &
+    python -m ascii_art_generator.loadtest photo.jpg --concurrency 16 --requests 200
+
+Sends the same image from several client threads and reports status
+codes, client-side p50/p99 latency and throughput, followed by the
+server's own /stats.
+"""
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import json
+import sys
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from .service import percentile
+
+
+def send(url, data):
+    """POST one image; return (status, seconds)."""
+    start = time.perf_counter()
+    request = Request(url, data=data, method='POST', headers={'Content-Type': 'application/octet-stream'})
+    try:
+        with urlopen(request, timeout=300) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        e.read()
+        status = e.code
+    except (URLError, OSError):
+        status = 'error'
+    return status, time.perf_counter() - start
+
+
+def run(base_url, data, requests, concurrency, params):
+    """Send requests with a fixed number of concurrent clients; return a report dict."""
+    url = f"{base_url}/convert?{urlencode(params)}"
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(lambda _: send(url, data), range(requests)))
+    elapsed = time.perf_counter() - start
+    ok_latencies = [seconds for status, seconds in outcomes if status == 200]
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'statuses': dict(Counter(str(status) for status, _ in outcomes)),
+        'p50_ms': percentile(ok_latencies, 50) * 1000,
+        'p99_ms': percentile(ok_latencies, 99) * 1000,
+        'throughput_per_s': len(ok_latencies) / elapsed,
+        'elapsed_s': elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ascii_art_generator.loadtest",
+                                     description="Load test a running conversion service.")
+    parser.add_argument('image', help="Image to upload with every request.")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="Service base URL.")
+    parser.add_argument('-n', '--requests', type=int, default=100, help="Total number of requests.")
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="Concurrent client threads.")
+    parser.add_argument('--format', default='text', choices=['text', 'html', 'ansi'], help="Requested output.")
+    parser.add_argument('--width', type=int, default=120, help="Output width.")
+    args = parser.parse_args(argv)
+
+    with open(args.image, 'rb') as f:
+        data = f.read()
+    report = run(args.url.rstrip('/'), data, args.requests, args.concurrency,
+                 {'format': args.format, 'width': args.width})
+    print(f"statuses:   {report['statuses']}")
+    print(f"latency:    p50 {report['p50_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
+    print(f"throughput: {report['throughput_per_s']:.1f} req/s over {report['elapsed_s']:.2f} s")
+    with urlopen(f"{args.url.rstrip('/')}/stats", timeout=10) as response:
+        print(f"server:     {json.dumps(json.load(response))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Per-stage timing and memory instrumentation.
+
+A StageProfiler is passed to ConversionEngine.convert(); without one the
+engine does no measuring at all. For every stage it records wall time, CPU
+time of the running thread and peak traced allocation (tracemalloc, which
+sees numpy buffers but not Pillow's own image memory). Stages nest because
+the pipeline is evaluated lazily, so both inclusive and self (exclusive)
+times and peaks are kept.
+
+tracemalloc is process-wide: it is started by the first profiler and
+stopped when the last one finishes, and peaks of profilers running at the
+same time include each other's allocations.
+
+Records can be exported as Chrome trace JSON (chrome://tracing, Perfetto)
+or appended as one JSON line per conversion to a log file.
+"""
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# Display names of the pipeline stages, numbered like the GUI pipeline
+STAGE_LABELS = {
+    'load': 'load',
+    'prescale': 'prescale',
+    'background': '1. background removal',
+    'effects': '2. effects',
+    'enhance': '3. enhancements',
+    'transparency': '4. transparency',
+    'resize': '5. resize',
+    'grayscale': '6. grayscale',
+    'mapping': '7. mapping',
+    'formatting': '8. formatting',
+    'display': 'display',
+    'write': 'write',
+}
+
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_users = 1
+        elif _tracing_users:
+            _tracing_users += 1
+        else:
+            return False # Traced by someone else; leave it alone
+    return True
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+
+class StageProfiler:
+    """Collects one record per stage of a conversion."""
+    def __init__(self, trace_memory=True):
+        self.records = []
+        self.trace_memory = trace_memory
+        self._stack = []
+        self._origin = time.perf_counter()
+        self._started_tracing = trace_memory and _start_tracing()
+
+    @contextmanager
+    def stage(self, name, **args):
+        """Measure the enclosed block as the stage name. Yields the record's args dict."""
+        name = STAGE_LABELS.get(name, name)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        memory_start = 0
+        if tracing:
+            memory_start, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._close_segment(self._stack[-1], peak)
+            tracemalloc.reset_peak()
+        entry = {'memory_start': memory_start, 'segment_start': memory_start, 'peak': 0, 'self_peak': 0,
+                 'child_wall': 0.0, 'child_cpu': 0.0}
+        self._stack.append(entry)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield args
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            self._stack.pop()
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                self._close_segment(entry, peak)
+                tracemalloc.reset_peak()
+            if self._stack:
+                parent = self._stack[-1]
+                parent['child_wall'] += wall
+                parent['child_cpu'] += cpu
+                if tracing:
+                    parent['peak'] = max(parent['peak'], entry['peak'] + memory_start - parent['memory_start'])
+                    parent['segment_start'] = current
+            self.records.append({
+                'stage': name,
+                'start_ms': (wall_start - self._origin) * 1000,
+                'wall_ms': wall * 1000,
+                'self_wall_ms': (wall - entry['child_wall']) * 1000,
+                'cpu_ms': cpu * 1000,
+                'self_cpu_ms': (cpu - entry['child_cpu']) * 1000,
+                'peak_bytes': entry['peak'] if tracing else None,
+                'self_peak_bytes': entry['self_peak'] if tracing else None,
+                'depth': len(self._stack),
+                'thread': threading.current_thread().name,
+                'args': args,
+            })
+
+    @staticmethod
+    def _close_segment(entry, peak):
+        # Peak of the stretch in which this stage ran its own code
+        entry['self_peak'] = max(entry['self_peak'], peak - entry['segment_start'])
+        entry['peak'] = max(entry['peak'], peak - entry['memory_start'])
+
+    def finish(self):
+        """Stop memory tracing if this profiler started it."""
+        if self._started_tracing:
+            self._started_tracing = False
+            _stop_tracing()
+
+    def breakdown(self):
+        """Records in pipeline order, i.e. the order the stages finished in."""
+        return list(self.records)
+
+    def format_breakdown(self):
+        """A small text table of self times, CPU times and self peak memory."""
+        lines = []
+        total = sum(r['self_wall_ms'] for r in self.records) or 1.0
+        for r in self.breakdown():
+            peak = f"{r['self_peak_bytes'] / 1048576:7.1f} MB" if r['self_peak_bytes'] is not None else "      -"
+            cached = " ♻️" if r['args'].get('cached') else ""
+            lines.append(f"{r['stage']:<22} {r['self_wall_ms']:8.1f} ms {r['self_wall_ms'] / total:5.0%} "
+                         f"cpu {r['self_cpu_ms']:8.1f} ms  peak {peak}{cached}")
+        return '\n'.join(lines)
+
+    def summary(self, count=3):
+        """The count slowest stages by self time, on one line."""
+        slowest = sorted(self.records, key=lambda r: r['self_wall_ms'], reverse=True)[:count]
+        return ' · '.join(f"{r['stage']} {r['self_wall_ms']:.0f} ms" for r in slowest)
+
+    def chrome_trace(self):
+        """The records as a Chrome trace event dictionary."""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for r in self.records:
+            tid = threads.setdefault(r['thread'], len(threads) + 1)
+            events.append({
+                'name': r['stage'], 'cat': 'stage', 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': round(r['start_ms'] * 1000, 1), 'dur': round(r['wall_ms'] * 1000, 1),
+                'args': dict(r['args'], cpu_ms=round(r['cpu_ms'], 3), peak_bytes=r['peak_bytes'],
+                             self_peak_bytes=r['self_peak_bytes']),
+            })
+        for name, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def log_record(self, **extra):
+        """One machine-readable record for the whole conversion."""
+        return dict(extra, time=time.time(), stages=self.breakdown())
+
+    def append_log(self, path, **extra):
+        """Append log_record() as one JSON line to path."""
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.log_record(**extra)) + '\n')
@@ -0,0 +1,85 @@
+"""
+Raster (PNG, WebP) export of a ConversionResult.
+
+The formatted text is turned into a grid of code points. Every character
+that can occur (the character set, border and space) is drawn once per
+font size into glyph tiles, which are cached. The picture is then built
+with array indexing: each cell picks its tile and the tiles are laid out
+side by side into one coverage mask. Pillow then blends the theme
+background with the cell colors (scaled up to tile size) or the theme's
+text color for mono art through that mask.
+"""
+import numpy as np
+from PIL import Image, ImageColor
+
+from .atlas import glyph_tiles
+from .engine import output_charset
+from .grid import layout_codes
+from .settings import HTML_THEMES
+
+DEFAULT_FONT_SIZE = 14
+RASTER_FORMATS = {'.png': 'PNG', '.webp': 'WEBP'}
+
+
+def text_codes(text):
+    """The lines of text as an (H, W) code point array, padded with spaces."""
+    lines = text.split('\n')
+    width = max(len(line) for line in lines)
+    return np.frombuffer(''.join(line.ljust(width) for line in lines).encode('utf-32-le'),
+                         dtype='<u4').reshape(len(lines), width)
+
+
+def cell_index(result, shape):
+    """
+    For color art: an array of the given text shape holding 1 + the index
+    of the cell each character belongs to, 0 for spacing and border.
+    Follows the same layout as the text formatting.
+    """
+    settings = result.settings
+    height, width = result.color_art.glyphs.shape
+    index = np.arange(1, height * width + 1, dtype=np.uint32).reshape(height, width)
+    index = layout_codes(index, settings['double_width'], settings['add_spacing'], '\0', between_columns=True)
+    if settings['add_border'] and height:
+        side = len(settings['border_char']) + 1
+        index = np.pad(index, ((1, 1), (side, side)))
+    return np.pad(index, ((0, shape[0] - index.shape[0]), (0, shape[1] - index.shape[1])))
+
+
+def render_image(result, theme='matrix', font_size=DEFAULT_FONT_SIZE):
+    """Render a ConversionResult as an RGB image; color art keeps its cell colors."""
+    colors = HTML_THEMES.get(theme, HTML_THEMES['matrix'])
+    background = ImageColor.getrgb(colors['bg'])[:3]
+    foreground = np.array(ImageColor.getrgb(colors['color'])[:3], dtype=np.uint8)
+
+    codes = text_codes(result.text)
+    settings = result.settings
+    chars = sorted(set(output_charset(settings)) | set(settings['border_char']) | {' '})
+    known = np.array([ord(c) for c in chars], dtype='<u4')
+    # Characters outside the set (should not happen) are looked up as well
+    extra = np.setdiff1d(codes, known)
+    if extra.size:
+        chars = sorted(chars + [chr(c) for c in extra.tolist()])
+        known = np.array([ord(c) for c in chars], dtype='<u4')
+    tiles = glyph_tiles(''.join(chars), font_size)
+    coverage = tiles[np.searchsorted(known, codes)]  # (H, W, tile height, tile width)
+
+    height, width, tile_height, tile_width = coverage.shape
+    size = (width * tile_width, height * tile_height)
+    mask = Image.fromarray(np.ascontiguousarray(coverage.transpose(0, 2, 1, 3)).reshape(size[1], size[0]), 'L')
+    if result.color_art is not None:
+        palette = np.vstack([foreground[None], result.color_art.colors.reshape(-1, 3)])
+        cells = Image.fromarray(palette[cell_index(result, codes.shape)], 'RGB')
+        ink = cells.resize(size, Image.Resampling.NEAREST)
+    else:
+        ink = Image.new('RGB', size, tuple(foreground.tolist()))
+    return Image.composite(ink, Image.new('RGB', size, background), mask)
+
+
+def save_image(file_path, result, theme='matrix', font_size=DEFAULT_FONT_SIZE):
+    """Save a ConversionResult as PNG or WebP, chosen by the file extension."""
+    extension = file_path[file_path.rfind('.'):].lower()
+    image = render_image(result, theme, font_size)
+    if RASTER_FORMATS.get(extension) == 'WEBP':
+        image.save(file_path, 'WEBP', lossless=True)
+    else:
+        image.save(file_path, 'PNG')
@@ -0,0 +1,81 @@
+"""
+Connected regions of a boolean mask, found with scanline runs.
+
+Every row of the mask is split into runs of True cells. Runs in adjacent
+rows that overlap (4-connectivity) are joined by propagating the smallest
+label along the overlaps until nothing changes. All steps are array
+operations over runs, so the cost grows with the number of runs rather
+than the number of pixels.
+"""
+import numpy as np
+
+
+def mask_runs(mask):
+    """Return (rows, starts, ends) of the runs of True cells, row by row."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    changes = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(changes == 1)
+    _, ends = np.nonzero(changes == -1)
+    return rows, starts, ends
+
+
+def _overlapping_runs(rows, starts, ends):
+    """Index pairs (a, b) of runs in consecutive rows whose columns overlap."""
+    pairs_a, pairs_b = [], []
+    # Runs are ordered by row, then column, so each row is a contiguous slice
+    row_bounds = np.searchsorted(rows, np.arange(rows.max() + 2)) if len(rows) else np.zeros(1, dtype=np.intp)
+    for y in range(len(row_bounds) - 2):
+        a0, a1 = row_bounds[y], row_bounds[y + 1]
+        b0, b1 = row_bounds[y + 1], row_bounds[y + 2]
+        if a0 == a1 or b0 == b1:
+            continue
+        # Run b overlaps runs a whose start < b.end and end > b.start
+        first = a0 + np.searchsorted(ends[a0:a1], starts[b0:b1], side='right')
+        last = a0 + np.searchsorted(starts[a0:a1], ends[b0:b1], side='left')
+        counts = np.maximum(last - first, 0)
+        if not counts.any():
+            continue
+        b = np.repeat(np.arange(b0, b1), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pairs_a.append(np.repeat(first, counts) + offsets)
+        pairs_b.append(b)
+    if not pairs_a:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    return np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+
+def run_labels(rows, starts, ends):
+    """Label every run with the smallest run index of its connected region."""
+    labels = np.arange(len(rows))
+    a, b = _overlapping_runs(rows, starts, ends)
+    while len(a):
+        joined = np.minimum(labels[a], labels[b])
+        updated = labels.copy()
+        np.minimum.at(updated, a, joined)
+        np.minimum.at(updated, b, joined)
+        # Pointer jumping: follow labels to their current root
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return labels
+
+
+def border_connected(mask):
+    """Boolean mask of the True cells connected to the image border."""
+    height, width = mask.shape
+    result = np.zeros(mask.shape, dtype=bool)
+    rows, starts, ends = mask_runs(mask)
+    if not len(rows):
+        return result
+    labels = run_labels(rows, starts, ends)
+    touches = (rows == 0) | (rows == height - 1) | (starts == 0) | (ends == width)
+    keep = np.isin(labels, np.unique(labels[touches]))
+
+    # Paint the kept runs with a +1/-1 difference per row and a running sum
+    paint = np.zeros((height, width + 1), dtype=np.int32)
+    np.add.at(paint, (rows[keep], starts[keep]), 1)
+    np.add.at(paint, (rows[keep], ends[keep]), -1)
+    return np.cumsum(paint, axis=1)[:, :width] > 0
@@ -0,0 +1,281 @@
+"""
+Local HTTP conversion service.
+
+    POST /convert?width=120&color_ascii=true&format=html   (body: image bytes)
+    GET  /stats
+    GET  /health
+
+Settings are passed as query parameters using the same keys as the GUI;
+"format" selects text (default), html or ansi output, "theme" the HTML
+theme and "ansi" the ANSI color mode. Conversions run in a bounded process
+pool. Once workers + queue_size requests are in progress, new requests are
+rejected with 503 instead of queueing without limit.
+
+Images that cannot be decoded get 422. Anything else that goes wrong is a
+server fault (500); if a worker process died, the pool is replaced and the
+request gets 503 so the client can retry.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from .settings import ANSI_MODES, DEFAULT_SETTINGS, HTML_THEMES, SETTING_CHOICES, SETTING_RANGES
+
+OUTPUT_TYPES = {
+    'text': 'text/plain; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+    'ansi': 'text/plain; charset=utf-8',
+}
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+LATENCY_WINDOW = 1000  # Latest requests used for the percentiles
+
+
+def percentile(values, q):
+    """The q-th percentile (0-100) of a list of numbers, nearest-rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def parse_settings(query):
+    """
+    Convert query parameters into conversion settings, typed like
+    DEFAULT_SETTINGS. Raises ValueError for unknown values and for numbers
+    outside the ranges the GUI allows, so one request cannot ask for an
+    arbitrarily large conversion.
+    """
+    settings = {}
+    for key, value in query.items():
+        if key not in DEFAULT_SETTINGS:
+            continue
+        default = DEFAULT_SETTINGS[key]
+        if isinstance(default, bool):
+            if value.lower() not in ('1', '0', 'true', 'false', 'yes', 'no', 'on', 'off'):
+                raise ValueError(f"{key} must be true or false")
+            value = value.lower() in ('1', 'true', 'yes', 'on')
+        else:
+            try:
+                value = type(default)(value)
+            except ValueError:
+                raise ValueError(f"{key} must be of type {type(default).__name__}") from None
+        if key in SETTING_CHOICES and value not in SETTING_CHOICES[key]:
+            raise ValueError(f"{key} must be one of {SETTING_CHOICES[key]}")
+        if key in SETTING_RANGES and not SETTING_RANGES[key][0] <= value <= SETTING_RANGES[key][1]:
+            raise ValueError(f"{key} must be between {SETTING_RANGES[key][0]} and {SETTING_RANGES[key][1]}")
+        if key == 'border_char' and len(value) != 1:
+            raise ValueError("border_char must be a single character")
+        settings[key] = value
+    return settings
+
+
+class ImageDecodeError(Exception):
+    """The uploaded bytes are not an image Pillow can decode."""
+
+
+def _render(data, settings, output, theme, ansi_mode):
+    """Convert image bytes and render the result (runs in a worker process)."""
+    from PIL import Image
+    from .ansi import ansi_text
+    from .engine import ConversionEngine
+    from .export import write_html
+
+    # Pillow reports unknown, truncated and corrupt data as OSError or
+    # SyntaxError, raised when opening or when the engine loads the pixels
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            result = ConversionEngine(settings).convert(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ImageDecodeError(f"{type(e).__name__}: {e}") from None
+    if output == 'html':
+        buffer = io.StringIO()
+        write_html(buffer, result, theme)
+        return buffer.getvalue()
+    if output == 'ansi':
+        return ansi_text(result, ansi_mode) + '\n'
+    return result.text + '\n'
+
+
+class ServiceStats:
+    """Thread-safe counters and latencies for the /stats endpoint."""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.started = time.monotonic()
+        self.in_progress = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)  # (finished at, seconds)
+        self._lock = threading.Lock()
+
+    def try_admit(self):
+        """Reserve a slot for a request; False when the service is full."""
+        with self._lock:
+            if self.in_progress >= self.capacity:
+                self.rejected += 1
+                return False
+            self.in_progress += 1
+            return True
+
+    def finish(self, latency, ok):
+        with self._lock:
+            self.in_progress -= 1
+            if ok:
+                self.completed += 1
+                self._latencies.append((time.monotonic(), latency))
+            else:
+                self.failed += 1
+
+    def snapshot(self, workers):
+        with self._lock:
+            now = time.monotonic()
+            latencies = [latency for _, latency in self._latencies]
+            recent = [finished for finished, _ in self._latencies if now - finished <= 60]
+            return {
+                'workers': workers,
+                'capacity': self.capacity,
+                'in_progress': self.in_progress,
+                'queue_depth': max(0, self.in_progress - workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'throughput_per_s': len(recent) / min(60.0, max(now - self.started, 1e-9)),
+                'uptime_s': now - self.started,
+            }
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    server_version = "ASCIIArtGenerator/2.0"
+
+    def _send(self, status, body, content_type='text/plain; charset=utf-8', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/stats':
+            self._send(200, json.dumps(self.server.stats.snapshot(self.server.workers)), 'application/json')
+        elif path == '/health':
+            self._send(200, 'ok\n')
+        else:
+            self._send(404, 'not found\n')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self._send(404, 'not found\n')
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length <= 0 or length > MAX_UPLOAD_BYTES:
+            self._send(413 if length > MAX_UPLOAD_BYTES else 400, 'expected an image body with Content-Length\n')
+            return
+
+        query = dict(parse_qsl(url.query))
+        output = query.get('format', 'text')
+        theme = query.get('theme', 'matrix')
+        ansi_mode = query.get('ansi', 'truecolor')
+        try:
+            if output not in OUTPUT_TYPES:
+                raise ValueError(f"format must be one of {list(OUTPUT_TYPES)}")
+            if theme not in HTML_THEMES:
+                raise ValueError(f"theme must be one of {list(HTML_THEMES)}")
+            if ansi_mode not in ANSI_MODES:
+                raise ValueError(f"ansi must be one of {list(ANSI_MODES)}")
+            settings = parse_settings(query)
+        except ValueError as e:
+            self._send(400, f"{e}\n")
+            return
+
+        stats = self.server.stats
+        if not stats.try_admit():
+            # Discard the upload in small chunks so the client gets the reply
+            remaining = length
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 65536))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+            self._send(503, 'server busy, retry later\n', headers={'Retry-After': '1'})
+            return
+
+        start = time.perf_counter()
+        ok = False
+        pool = self.server.pool
+        try:
+            data = self.rfile.read(length)
+            body = pool.submit(_render, data, settings, output, theme, ansi_mode).result()
+            ok = True
+        except ImageDecodeError as e:
+            self._send(422, f"cannot decode image: {e}\n")
+        except BrokenProcessPool:
+            self.server.replace_pool(pool)
+            self._send(503, 'conversion worker crashed, retry later\n', headers={'Retry-After': '1'})
+        except Exception as e:
+            self._send(500, f"conversion failed: {type(e).__name__}: {e}\n")
+        finally:
+            stats.finish(time.perf_counter() - start, ok)
+        if ok:
+            self._send(200, body, OUTPUT_TYPES[output])
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """HTTP server that runs conversions on a bounded process pool."""
+    daemon_threads = True
+
+    def __init__(self, address, workers=None, queue_size=None, verbose=False):
+        super().__init__(address, ConversionHandler)
+        self.workers = workers or os.cpu_count() or 1
+        queue_size = self.workers * 2 if queue_size is None else queue_size
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._pool_lock = threading.Lock()
+        self.stats = ServiceStats(self.workers + queue_size)
+        self.verbose = verbose
+
+    def replace_pool(self, broken):
+        """
+        Replace a pool that became unusable because a worker died. Every
+        request that was on it sees the same broken pool; only the first
+        one replaces it.
+        """
+        with self._pool_lock:
+            if self.pool is broken:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+def serve(host='127.0.0.1', port=8000, workers=None, queue_size=None, verbose=False):
+    """Run the service until interrupted."""
+    with ConversionServer((host, port), workers, queue_size, verbose) as server:
+        print(f"🌐 Serving on http://{host}:{server.server_address[1]} "
+              f"({server.workers} workers, {server.stats.capacity} requests max)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,106 @@
+"""
+Character sets and conversion settings shared by the GUI, the CLI and the engine.
+
+This module is plain Python so it can be imported without numpy or Pillow.
+"""
+
+# --- ASCII Character Sets ---
+# Using dictionaries for easier access and potential expansion
+ASCII_SETS = {
+    "Detailed": list("█▉▊▋▌▍▎▏ "),
+    "Classic": list("@%#*+=-:. "),
+    "Blocks": list("██▓▒░ "),
+    "Lines": list("≡+=:-. "),
+    "Dots": list("●◐◑◒◓○⚬⚪ "),
+    "Braille": list("⣿⣾⣽⣻⣟⣯⣷⣶⣴⣲⣱⣰⣠⣀ "),
+}
+
+# Every Braille pattern, indexed by its 8 dot bits (U+2800 to U+28FF)
+BRAILLE_DOTS = [chr(0x2800 + bits) for bits in range(256)]
+
+# --- Default Settings ---
+# Same keys and defaults as the GUI's _get_current_settings()
+DEFAULT_SETTINGS = {
+    'width': 120,
+    'brightness': 1.0,
+    'contrast': 1.0,
+    'sharpness': 1.0,
+    'saturation': 1.0,
+    'remove_bg': False,
+    'bg_mode': 'color',
+    'bg_threshold': 240,
+    'bg_feather': 5,
+    'effects': 'enhance',
+    'char_set': 'Detailed',
+    'mapping_mode': 'brightness',
+    'adaptive': True,
+    'equalization': 'global',
+    'clahe_tiles': 8,
+    'clahe_clip': 2.0,
+    'dithering': False,
+    'dither_algorithm': 'floyd-steinberg',
+    'preserve_detail': True,
+    'aspect_correction': True,
+    'color_mode': 'weighted',
+    'color_channel': 'red',
+    'double_width': False,
+    'add_spacing': False,
+    'reverse_colors': False,
+    'smart_background': True,
+    'add_border': False,
+    'border_char': '█',
+    'color_ascii': False,
+    'palette_size': 64,
+    'decode_oversample': 0,
+    'pipeline_order': 'quality',
+    'tiled_processing': False,
+    'memory_budget_mb': 256,
+}
+
+# Allowed values for the settings that are picked from a list
+SETTING_CHOICES = {
+    'bg_mode': ['color', 'connected'],
+    'effects': ['none', 'enhance', 'smooth', 'edge', 'artistic', 'dramatic'],
+    'char_set': list(ASCII_SETS.keys()),
+    'mapping_mode': ['brightness', 'structure', 'braille'],
+    'equalization': ['global', 'clahe'],
+    'clahe_tiles': [2, 4, 8, 16],
+    'color_mode': ['weighted', 'desaturate', 'channel'],
+    'color_channel': ['red', 'green', 'blue'],
+    'dither_algorithm': ['floyd-steinberg', 'atkinson', 'bayer'],
+    'palette_size': [0, 16, 32, 64, 128, 256],
+    'decode_oversample': [0, 2, 4, 8],
+    'pipeline_order': ['quality', 'fast'],
+    'memory_budget_mb': [64, 128, 256, 512, 1024],
+}
+
+# (lowest, highest) allowed value of the numeric settings set with a slider
+SETTING_RANGES = {
+    'width': (50, 500),
+    'brightness': (0.1, 3.0),
+    'contrast': (0.1, 3.0),
+    'sharpness': (0.1, 3.0),
+    'saturation': (0.1, 3.0),
+    'bg_threshold': (1, 255),
+    'bg_feather': (0, 20),
+    'clahe_clip': (1.0, 8.0),
+}
+
+# --- HTML Themes ---
+HTML_THEMES = {
+    'matrix': {'bg': '#000000', 'color': '#00ff00', 'font': 'Courier New'},
+    'terminal': {'bg': '#1e1e1e', 'color': '#ffffff', 'font': 'Consolas'},
+    'retro': {'bg': '#000080', 'color': '#ffff00', 'font': 'monospace'},
+    'paper': {'bg': '#f5f5f5', 'color': '#000000', 'font': 'Courier New'},
+}
+
+# Terminal color modes for ANSI output
+ANSI_MODES = ('truecolor', '256', '16')
+
+
+def merge_settings(settings=None):
+    """Return DEFAULT_SETTINGS updated with the given overrides."""
+    merged = dict(DEFAULT_SETTINGS)
+    if settings:
+        merged.update(settings)
+    return merged
@@ -0,0 +1,178 @@
+"""
+Strip-based loading for images too large to hold in memory.
+
+The source is read in horizontal bands of rows. Each band gets the
+background mask applied and is then folded into a running area-average at
+the working resolution (FAST_OVERSAMPLE times the output width), so only
+one band and the small working image exist at any time. Colors are
+averaged premultiplied by alpha, which makes flattening the working image
+onto a background identical to averaging the flattened full-size pixels.
+The smart-background color is accumulated from the same bands.
+
+Only uncompressed files (BMP, PPM/PGM, uncompressed TIFF) can be read this
+way: rows are read straight from disk at their offset. Pillow cannot decode
+compressed formats (PNG, JPEG, WebP, GIF, compressed TIFF) partially, so
+can_stream() rejects them and the engine converts them untiled instead.
+"""
+import math
+import threading
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+# Working bytes per source pixel while a band is processed: the RGBA band,
+# float64 alpha, premultiplied colors and background distances
+BYTES_PER_PIXEL = 96
+
+# Bits per pixel of the raw layouts that can be read row by row
+RAW_BITS = {
+    '1': 1, '1;I': 1, 'L': 8, 'P': 8, 'LA': 16,
+    'RGB': 24, 'BGR': 24, 'RGBA': 32, 'BGRA': 32, 'RGBX': 32, 'BGRX': 32, 'CMYK': 32,
+}
+
+_unchecked_lock = threading.Lock()
+
+
+def open_unchecked(path):
+    """
+    Open an image file like Image.open, but without Pillow's decompression
+    bomb check. Only use it for reading headers or bands; a full decode
+    should go through Image.open. The limit is lifted only while the header
+    is parsed (Image.open does not decode pixels); it is process-wide, so an
+    Image.open on another thread at that moment is not checked either.
+    """
+    with _unchecked_lock:
+        limit = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            return Image.open(path)
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+
+
+def _raw_layout(image):
+    """(offset, rawmode, stride, orientation) if the pixels are stored raw, row by row, else None."""
+    width, height = image.size
+    tile = image.tile
+    if len(tile) != 1 or tile[0][0] != 'raw' or tuple(tile[0][1]) != (0, 0, width, height):
+        return None
+    _, _, offset, args = tile[0]
+    rawmode, stride, orientation = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+    if rawmode not in RAW_BITS:
+        return None
+    return offset, rawmode, stride or (width * RAW_BITS[rawmode] + 7) // 8, orientation
+
+
+def can_stream(path):
+    """Whether an image file can be read in bands without decoding all of it."""
+    with open_unchecked(path) as image:
+        return _raw_layout(image) is not None
+
+
+class StripReader:
+    """Read bands of rows of an uncompressed image file as RGBA arrays."""
+    def __init__(self, path):
+        self._image = open_unchecked(path)
+        self._raw = _raw_layout(self._image)
+        if self._raw is None:
+            self._image.close()
+            raise ValueError(f"Cannot read {path} in bands: its pixels are compressed.")
+        self._file = open(path, 'rb')
+        self.size = self._image.size
+
+    def close(self):
+        self._file.close()
+        self._image.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self, y0, y1):
+        """Rows y0..y1-1 as a (rows, width, 4) uint8 array."""
+        width, height = self.size
+        offset, rawmode, stride, orientation = self._raw
+        rows = y1 - y0
+        # Bottom-up files (BMP) store row y at position height-1-y
+        first = y0 if orientation >= 0 else height - y1
+        self._file.seek(offset + first * stride)
+        data = self._file.read(rows * stride)
+        band = Image.frombytes(self._image.mode, (width, rows), data, 'raw', rawmode, stride, orientation)
+        if band.mode == 'P':
+            band.putpalette(self._image.getpalette())
+            if 'transparency' in self._image.info:
+                band.info['transparency'] = self._image.info['transparency']
+        return np.asarray(band.convert('RGBA'))
+
+
+def band_rows(width, memory_budget_mb, halo=0):
+    """Rows per band so one band stays within the memory budget."""
+    rows = memory_budget_mb * 1024 * 1024 // (max(1, width) * BYTES_PER_PIXEL)
+    return max(1, rows - 2 * halo)
+
+
+def load_tiled(path, working_width, remove_bg=False, threshold=240, feather_radius=0,
+               memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Read an uncompressed image file (see can_stream) in bands and return an RGBA image at most working_width
+    wide. The background mask is applied at full resolution, exactly as
+    _intelligent_background_removal does, and the average color of the
+    opaque pixels is stored in image.info['smart_color'] (None if there
+    are none).
+    """
+    with StripReader(path) as reader:
+        width, height = reader.size
+        out_width = min(width, working_width)
+        out_height = max(1, round(height * out_width / width))
+        col_starts = np.arange(out_width) * width // out_width
+        row_starts = np.arange(out_height) * height // out_height
+        cell_pixels = np.diff(np.append(row_starts, height))[:, None] * np.diff(np.append(col_starts, width))[None, :]
+
+        bg_color = None
+        if remove_bg:
+            top, bottom = reader.read(0, 1)[0], reader.read(height - 1, height)[0]
+            corners = [top[0], top[-1], bottom[0], bottom[-1]]
+            bg_color = np.mean([c for c in corners if c[3] > 0], axis=0)[:3] if any(c[3] > 0 for c in corners) else (255, 255, 255)
+        # Gaussian blur support in rows, so band edges blur like the full image
+        halo = math.ceil(3 * feather_radius) + 3 if remove_bg and feather_radius > 0 else 0
+
+        color_sum = np.zeros((out_height, out_width, 3), dtype=np.float64)
+        alpha_sum = np.zeros((out_height, out_width), dtype=np.float64)
+        opaque_sum = np.zeros(3, dtype=np.int64)
+        opaque_count = 0
+
+        rows = band_rows(width, memory_budget_mb, halo)
+        for y0 in range(0, height, rows):
+            y1 = min(height, y0 + rows)
+            top, bottom = max(0, y0 - halo), min(height, y1 + halo)
+            band = reader.read(top, bottom)
+            alpha = band[:, :, 3]
+            if remove_bg:
+                distances = np.sqrt(np.sum((band[:, :, :3] - bg_color) ** 2, axis=2))
+                alpha = np.where(distances < threshold, 0, 255).astype(np.uint8)
+                del distances
+                if feather_radius > 0:
+                    alpha = np.array(Image.fromarray(alpha, 'L').filter(ImageFilter.GaussianBlur(radius=feather_radius)))
+            band, alpha = band[y0 - top:y1 - top, :, :3], alpha[y0 - top:y1 - top]
+
+            opaque = alpha > 128
+            opaque_sum += band[opaque].sum(axis=0, dtype=np.int64)
+            opaque_count += int(opaque.sum())
+
+            # Area-average into the working grid: columns first, then rows
+            weight = alpha.astype(np.float64)
+            premultiplied = np.add.reduceat(band * weight[:, :, None], col_starts, axis=1)
+            weight = np.add.reduceat(weight, col_starts, axis=1)
+            bins = np.searchsorted(row_starts, np.arange(y0, y1), side='right') - 1
+            starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+            color_sum[bins[starts]] += np.add.reduceat(premultiplied, starts, axis=0)
+            alpha_sum[bins[starts]] += np.add.reduceat(weight, starts, axis=0)
+
+    colors = np.divide(color_sum, alpha_sum[:, :, None], out=np.zeros_like(color_sum), where=alpha_sum[:, :, None] > 0)
+    working = np.dstack([colors, alpha_sum / cell_pixels])
+    image = Image.fromarray(np.clip(np.rint(working), 0, 255).astype(np.uint8), 'RGBA')
+    image.info['smart_color'] = tuple((opaque_sum / opaque_count).tolist()) if opaque_count else None
+    return image
@@ -0,0 +1,197 @@
+"""
+Virtualized viewer for ASCII art.
+
+A Canvas whose scroll region has the size of the whole art, but which
+only holds text items for the rows and columns inside the viewport. They
+are redrawn whenever the view moves, so the number of canvas items and
+the redraw cost depend on the window size, not on the size of the art.
+Rows are taken from the result in memory: plain lines for mono art and,
+for color art, one item per run of equal color, decoded from the
+ASCIIGrid only for the visible rows.
+"""
+import tkinter as tk
+from tkinter import font as tkfont
+
+from .grid import color_runs, hex_color
+
+MIN_FONT_SIZE = 4
+MAX_FONT_SIZE = 40
+# Pixels scrolled per mouse wheel step, in lines
+WHEEL_LINES = 3
+
+
+class ASCIIViewer(tk.Frame):
+    """Scrollable, zoomable view of mono or color ASCII art."""
+    def __init__(self, parent, family='Consolas', size=9, bg='#1e1e1e', fg='#00ff00', **kwargs):
+        super().__init__(parent, bg=bg, **kwargs)
+        self.font = tkfont.Font(family=family, size=size)
+        self.fg = fg
+        self.lines = []             # Mono rows
+        self.copy_text = ''         # What Ctrl+C copies
+        self.color_art = None       # Color rows come from here
+        self.ids = None
+        self.palette = None
+        self.colors = {}            # Color id -> '#rrggbb'
+        self.layout = (False, False)
+        self.columns = 0
+        self._redraw_job = None
+
+        self.canvas = tk.Canvas(self, bg=bg, highlightthickness=0, bd=0, xscrollincrement=1, yscrollincrement=1)
+        y_scroll = tk.Scrollbar(self, orient='vertical', command=self._yview)
+        x_scroll = tk.Scrollbar(self, orient='horizontal', command=self._xview)
+        self.canvas.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        self.canvas.grid(row=0, column=0, sticky='nsew')
+        y_scroll.grid(row=0, column=1, sticky='ns')
+        x_scroll.grid(row=1, column=0, sticky='ew')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.canvas.bind('<Configure>', lambda e: self._schedule_redraw())
+        self.canvas.bind('<MouseWheel>', self._on_wheel)
+        self.canvas.bind('<Shift-MouseWheel>', lambda e: self._on_wheel(e, horizontal=True))
+        self.canvas.bind('<Control-MouseWheel>', lambda e: self.zoom(1 if e.delta > 0 else -1))
+        # X11 reports the wheel as buttons 4 and 5
+        self.canvas.bind('<Button-4>', lambda e: self._scroll_lines(-WHEEL_LINES))
+        self.canvas.bind('<Button-5>', lambda e: self._scroll_lines(WHEEL_LINES))
+        self.canvas.bind('<Control-Button-4>', lambda e: self.zoom(1))
+        self.canvas.bind('<Control-Button-5>', lambda e: self.zoom(-1))
+        self.canvas.bind('<Control-c>', lambda e: self.copy_all())
+        self.canvas.bind('<Button-1>', lambda e: self.canvas.focus_set())
+        self._measure()
+
+    # --- Content ---
+    def show_text(self, text, fg=None):
+        """Show mono text."""
+        self.fg = fg or self.fg
+        self.copy_text = text
+        self.lines = text.split('\n')
+        self.color_art = self.ids = None
+        self.columns = max((len(line) for line in self.lines), default=0)
+        self._reset_view()
+
+    def show_color(self, color_art, ids, palette, double_width=False, add_spacing=False, text=None):
+        """
+        Show an ASCIIGrid colored by per-cell palette ids, laid out like
+        row_text(). text is what Ctrl+C copies, e.g. the result's formatted
+        text with its border; it defaults to the rows shown.
+        """
+        self.copy_text = text
+        self.lines = []
+        self.color_art, self.ids = color_art, ids
+        self.colors = {}
+        self.palette = palette
+        self.layout = (double_width, add_spacing)
+        self.columns = color_art.width * (1 + bool(double_width) + bool(add_spacing))
+        self._reset_view()
+
+    @property
+    def rows(self):
+        return self.color_art.height if self.color_art is not None else len(self.lines)
+
+    def text(self):
+        """The full text being shown."""
+        if self.color_art is not None:
+            return '\n'.join(self.color_art.row_texts(*self.layout))
+        return '\n'.join(self.lines)
+
+    def copy_all(self):
+        """Copy the full text (not just the visible part) to the clipboard."""
+        self.clipboard_clear()
+        self.clipboard_append(self.copy_text if self.copy_text is not None else self.text())
+        return 'break'
+
+    # --- Zoom ---
+    def zoom(self, steps):
+        """Change the font size by steps points, keeping the top-left cell in view."""
+        size = min(MAX_FONT_SIZE, max(MIN_FONT_SIZE, self.font.cget('size') + steps))
+        if size == self.font.cget('size'):
+            return 'break'
+        column = self.canvas.canvasx(0) / self.char_width
+        row = self.canvas.canvasy(0) / self.line_height
+        self.font.configure(size=size)
+        self._measure()
+        self._update_scrollregion()
+        self._move_to(column * self.char_width, row * self.line_height)
+        return 'break'
+
+    def _measure(self):
+        self.char_width = max(1, self.font.measure('M'))
+        self.line_height = max(1, self.font.metrics('linespace'))
+
+    # --- Scrolling ---
+    def _reset_view(self):
+        self._update_scrollregion()
+        self._move_to(0, 0)
+
+    def _update_scrollregion(self):
+        self.canvas.configure(scrollregion=(0, 0, self.columns * self.char_width, self.rows * self.line_height))
+
+    def _move_to(self, x, y):
+        width = max(1, self.columns * self.char_width)
+        height = max(1, self.rows * self.line_height)
+        self.canvas.xview_moveto(x / width)
+        self.canvas.yview_moveto(y / height)
+        self._schedule_redraw()
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self._schedule_redraw()
+
+    def _xview(self, *args):
+        self.canvas.xview(*args)
+        self._schedule_redraw()
+
+    def _scroll_lines(self, lines, horizontal=False):
+        if horizontal:
+            self.canvas.xview_scroll(lines * self.char_width, 'units')
+        else:
+            self.canvas.yview_scroll(lines * self.line_height, 'units')
+        self._schedule_redraw()
+        return 'break'
+
+    def _on_wheel(self, event, horizontal=False):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        notches = event.delta / 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_lines(-round(notches * WHEEL_LINES) or (-1 if event.delta > 0 else 1), horizontal)
+
+    # --- Drawing ---
+    def _schedule_redraw(self):
+        if self._redraw_job is None:
+            self._redraw_job = self.after_idle(self._redraw)
+
+    def _redraw(self):
+        """Replace the canvas items with the rows and columns in the viewport."""
+        self._redraw_job = None
+        self.canvas.delete('cell')
+        left, top = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        first_row = max(0, int(top // self.line_height))
+        last_row = min(self.rows, int((top + self.canvas.winfo_height()) // self.line_height) + 1)
+        first_col = max(0, int(left // self.char_width))
+        last_col = min(self.columns, int((left + self.canvas.winfo_width()) // self.char_width) + 1)
+        if first_col >= last_col:
+            return
+
+        for y in range(first_row, last_row):
+            top_y = y * self.line_height
+            if self.color_art is None:
+                text = self.lines[y][first_col:last_col]
+                if text.strip():
+                    self.canvas.create_text(first_col * self.char_width, top_y, text=text, anchor='nw',
+                                            font=self.font, fill=self.fg, tags='cell')
+                continue
+            self._draw_color_row(y, top_y, first_col, last_col)
+
+    def _draw_color_row(self, y, top_y, first_col, last_col):
+        double_width, add_spacing = self.layout
+        cell_width = 1 + bool(double_width) + bool(add_spacing)
+        first_cell, last_cell = first_col // cell_width, -(-last_col // cell_width)
+        line = self.color_art.row_text(y, double_width, add_spacing)
+        starts, ends, run_ids = color_runs(self.ids[y, first_cell:last_cell])
+        for start, end, color_id in zip(starts.tolist(), ends.tolist(), run_ids.tolist()):
+            text = line[(first_cell + start) * cell_width:(first_cell + end) * cell_width]
+            if not text.strip():
+                continue
+            if color_id not in self.colors:
+                self.colors[color_id] = hex_color(self.palette[color_id])
+            self.canvas.create_text((first_cell + start) * cell_width * self.char_width, top_y, text=text, anchor='nw',
+                                    font=self.font, fill=self.colors[color_id], tags='cell')
@@ -0,0 +1,26 @@
+import multiprocessing
+import os
+import signal
+
+import numpy as np
+from PIL import Image
+
+from ascii_art_generator.animation import convert_frames
+
+
+def test_frames_survive_a_killed_worker(tmp_path):
+    path = str(tmp_path / 'animation.gif')
+    frames = [Image.fromarray(np.full((40, 60), 20 * i, dtype=np.uint8)).convert('RGB') for i in range(8)]
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=50)
+
+    converted = []
+    for frame in convert_frames(path, {'width': 30}, workers=1, max_in_flight=3):
+        if not converted:
+            # Take the pool down while the next frames are still in flight
+            for child in multiprocessing.active_children():
+                os.kill(child.pid, signal.SIGKILL)
+        converted.append(frame)
+
+    assert [frame.index for frame in converted] == list(range(8))
+    assert [frame.error for frame in converted if not frame.ok] == []
+    assert all(frame.result.text for frame in converted)
@@ -0,0 +1,31 @@
+import multiprocessing
+import os
+import shutil
+import signal
+
+from ascii_art_generator.batch import run_batch
+
+IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'image.png')
+
+
+def test_batch_survives_a_killed_worker(tmp_path):
+    sources = tmp_path / 'in'
+    sources.mkdir()
+    for i in range(6):
+        shutil.copy(IMAGE, sources / f'image{i}.png')
+    killed = []
+
+    def kill_workers(item):
+        # Take the pool down while the next images are still in flight
+        if not killed:
+            for child in multiprocessing.active_children():
+                os.kill(child.pid, signal.SIGKILL)
+                killed.append(child.pid)
+
+    report = run_batch([str(sources)], str(tmp_path / 'out'), settings={'width': 60},
+                       workers=1, max_in_flight=3, on_item=kill_workers)
+
+    assert killed
+    assert len(report.items) == 6
+    assert [item.error for item in report.failed] == []
+    assert sorted(os.listdir(tmp_path / 'out')) == [f'image{i}.txt' for i in range(6)]
@@ -0,0 +1,30 @@
+import io
+import os
+
+import pytest
+
+from ascii_art_generator.container import open_result, save_container
+from ascii_art_generator.engine import ConversionEngine
+from ascii_art_generator.export import write_html
+
+IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'image.png')
+
+
+def html(result):
+    f = io.StringIO()
+    write_html(f, result)
+    return f.getvalue()
+
+
+@pytest.mark.parametrize('colors', ['rgb', 'palette'])
+@pytest.mark.parametrize('palette_size', [0, 16, 64])
+def test_container_round_trip_renders_the_same_html(tmp_path, colors, palette_size):
+    result = ConversionEngine({'width': 80, 'color_ascii': True, 'palette_size': palette_size}).convert(IMAGE)
+    path = str(tmp_path / 'art.aag')
+    save_container(path, result, colors)
+    stored = open_result(path)
+    try:
+        assert stored.text == result.text
+        assert html(stored) == html(result)
+    finally:
+        stored.close()
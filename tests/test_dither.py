@@ -0,0 +1,46 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from ascii_art_generator.dither import DIFFUSION_KERNELS, error_diffusion
+
+
+def raster_diffusion(positions, levels, kernel):
+    """The classic pixel-by-pixel error diffusion, in raster order."""
+    work = positions.astype(np.float64) - 0.5
+    height, width = work.shape
+    glyphs = np.zeros(work.shape, dtype=np.uint16)
+    for y in range(height):
+        for x in range(width):
+            quantized = min(max(np.rint(work[y, x]), 0), levels - 1)
+            glyphs[y, x] = quantized
+            error = work[y, x] - quantized
+            for dx, dy, weight in DIFFUSION_KERNELS[kernel]:
+                if 0 <= x + dx < width and y + dy < height:
+                    work[y + dy, x + dx] += weight * error
+    return glyphs
+
+
+@pytest.mark.parametrize('kernel', sorted(DIFFUSION_KERNELS))
+@pytest.mark.parametrize('shape', [(1, 1), (1, 9), (9, 1), (13, 29), (20, 90), (150, 3)])
+def test_error_diffusion_matches_raster_order(kernel, shape):
+    positions = np.random.default_rng(1).random(shape) * 10
+    result = error_diffusion(positions, 10, kernel)
+    assert result.dtype == np.uint16
+    assert np.array_equal(result, raster_diffusion(positions, 10, kernel))
+
+
+def test_error_diffusion_tall_narrow_memory():
+    # An image-sized sheared buffer would need (W + 2H) * H floats, ~6 GB here
+    positions = np.random.default_rng(2).random((20000, 3)) * 10
+    tracemalloc.start()
+    try:
+        result = error_diffusion(positions, 10)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert result.shape == positions.shape
+    assert peak < 64 * 1024 * 1024
+    # Error only flows down, so the top rows match a short image
+    assert np.array_equal(result[:40], error_diffusion(positions[:40], 10))
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ascii_art_generator.engine import ConversionEngine
+from ascii_art_generator.tiled import can_stream, open_unchecked
+
+IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'image.png')
+
+
+@pytest.fixture
+def transparent_image(tmp_path):
+    """The repository's sample image with a transparent band on the left, as an uncompressed TIFF."""
+    image = Image.open(IMAGE).convert('RGBA')
+    pixels = np.array(image)
+    pixels[:, :pixels.shape[1] // 4, 3] = 0
+    path = tmp_path / 'transparent.tif'
+    Image.fromarray(pixels, 'RGBA').save(path)
+    assert can_stream(str(path))
+    return str(path)
+
+
+def background_color(path, **settings):
+    """The smart background color chosen for the transparent band."""
+    result = ConversionEngine(dict(settings, smart_background=True)).convert(path)
+    return np.asarray(result.image, dtype=np.int16)[0, 0]
+
+
+@pytest.mark.parametrize('settings', [
+    {'effects': 'none'},
+    {'brightness': 3.0},
+    {'brightness': 3.0, 'effects': 'none'},
+    {'contrast': 0.4, 'saturation': 2.0},
+    {'effects': 'artistic'},
+])
+def test_tiled_smart_background_matches_untiled(transparent_image, settings):
+    # Tiled mode filters at twice the output width, like the fast order
+    untiled = background_color(transparent_image, pipeline_order='fast', **settings)
+    tiled = background_color(transparent_image, tiled_processing=True, **settings)
+    assert np.abs(tiled - untiled).max() <= 2, (tiled, untiled)
+
+
+def test_tiled_smart_background_without_enhancements_matches_quality_order(transparent_image):
+    untiled = background_color(transparent_image, effects='none')
+    tiled = background_color(transparent_image, effects='none', tiled_processing=True)
+    assert np.abs(tiled - untiled).max() <= 2, (tiled, untiled)
+
+
+def test_only_uncompressed_files_are_streamed(tmp_path):
+    image = Image.open(IMAGE).convert('RGB')
+    for name, streamed in [('a.bmp', True), ('a.ppm', True), ('a.tif', True), ('a.png', False), ('a.jpg', False)]:
+        image.save(tmp_path / name)
+        assert can_stream(str(tmp_path / name)) == streamed, name
+    # Compressed files fall back to the normal path, decoded at reduced size
+    path = str(tmp_path / 'a.png')
+    tiled = ConversionEngine({'tiled_processing': True}).convert(path)
+    untiled = ConversionEngine({'decode_oversample': 2}).convert(path)
+    assert tiled.text == untiled.text
+
+
+def test_open_unchecked_skips_the_bomb_check(monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 100)
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(IMAGE)
+    with open_unchecked(IMAGE) as image:
+        assert image.width * image.height > 100
+    assert Image.MAX_IMAGE_PIXELS == 100